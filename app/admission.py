@@ -0,0 +1,209 @@
+import os
+import time
+import asyncio
+import contextvars
+
+from app.metrics import Counter, register
+
+# --- Admission control settings (tune via env vars) ---
+# Whole-request budgets. Streaming endpoints spend theirs on getting the first bytes out.
+QUERY_DEADLINE_SECONDS = float(os.getenv("QUERY_DEADLINE_SECONDS", "10"))
+BATCH_DEADLINE_SECONDS = float(os.getenv("BATCH_DEADLINE_SECONDS", "30"))
+VOICE_DEADLINE_SECONDS = float(os.getenv("VOICE_DEADLINE_SECONDS", "20"))
+
+# Requests of a kind being served at once; more are turned away with 429 before any work is done
+QUERY_MAX_IN_FLIGHT = int(os.getenv("QUERY_MAX_IN_FLIGHT", "256"))
+VOICE_MAX_IN_FLIGHT = int(os.getenv("VOICE_MAX_IN_FLIGHT", "64"))
+
+# Per-stage timeouts (seconds), further capped by what is left of the request's deadline
+STAGE_TIMEOUTS = {
+    "stt": float(os.getenv("STT_TIMEOUT", "15")),
+    "retrieval": float(os.getenv("RETRIEVAL_TIMEOUT", "5")),
+    "llm": float(os.getenv("LLM_TIMEOUT", "15")),
+    "tts": float(os.getenv("TTS_TIMEOUT", "15")),
+}
+
+# Less time left than this and the stage isn't started - the degraded fallback is used instead
+LLM_MIN_SECONDS = float(os.getenv("LLM_MIN_SECONDS", "2"))
+TTS_MIN_SECONDS = float(os.getenv("TTS_MIN_SECONDS", "1.5"))
+
+RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", "2"))
+
+# Absolute time.monotonic() by which the current request should be answered (None: no deadline)
+request_deadline = contextvars.ContextVar("request_deadline", default=None)
+# Stages the current request skipped or replaced with a fallback, for the X-Degraded header
+request_degraded = contextvars.ContextVar("request_degraded", default=None)
+
+REJECTED = register(Counter("japanaut_rejected_total", "Work shed by admission control, by stage and reason"))
+DEGRADED = register(Counter("japanaut_degraded_total", "Answers served with a stage skipped or replaced by a fallback"))
+
+
+class OverloadedError(Exception):
+    """A stage's queue is full - shed the request instead of waiting"""
+
+    def __init__(self, stage: str):
+        super().__init__(f"{stage} is at capacity")
+        self.stage = stage
+
+
+class DeadlineExceeded(TimeoutError):
+    """A stage didn't finish within its timeout or the request's remaining time"""
+
+    def __init__(self, stage: str):
+        super().__init__(f"{stage} ran out of time")
+        self.stage = stage
+
+
+class SpeechUnavailable(Exception):
+    """TTS failed before any audio went out; carries the text answer to send instead"""
+
+    def __init__(self, answer: str):
+        super().__init__("tts unavailable")
+        self.answer = answer
+
+
+def time_left() -> float:
+    deadline = request_deadline.get()
+    return float("inf") if deadline is None else deadline - time.monotonic()
+
+
+def clear_deadline():
+    """The first bytes are out: the rest of a stream is only bounded by the per-stage timeouts"""
+    request_deadline.set(None)
+
+
+def degrade(stage: str):
+    DEGRADED.inc(stage=stage)
+    degraded = request_degraded.get()
+    if degraded is not None and stage not in degraded:
+        degraded.append(stage)
+
+
+async def with_timeout(stage: str, awaitable):
+    """Await a stage within its timeout and the request's remaining time; raises DeadlineExceeded"""
+    timeout = min(STAGE_TIMEOUTS[stage], time_left())
+    if timeout <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        REJECTED.inc(stage=stage, reason="deadline")
+        raise DeadlineExceeded(stage)
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        REJECTED.inc(stage=stage, reason="timeout")
+        raise DeadlineExceeded(stage) from None
+
+
+async def first_within(stage: str, items):
+    """Iterate an async generator, with with_timeout applied to its first item only (time to first output)"""
+    iterator = items.__aiter__()
+    try:
+        first = await with_timeout(stage, iterator.__anext__())
+    except StopAsyncIteration:
+        return
+    yield first
+    async for item in iterator:
+        yield item
+
+
+class AdmissionSemaphore:
+    """
+    A semaphore with a bounded queue: at most `limit` holders and `max_waiting`
+    waiters. Anyone beyond that gets OverloadedError straight away, and waiting
+    stops when the request's deadline passes.
+    """
+
+    def __init__(self, stage: str, limit: int, max_waiting: int):
+        self.stage = stage
+        self.max_waiting = max_waiting
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    def locked(self) -> bool:
+        return self._semaphore.locked()
+
+    async def __aenter__(self):
+        if self._semaphore.locked():
+            if self.waiting >= self.max_waiting:
+                REJECTED.inc(stage=self.stage, reason="queue_full")
+                raise OverloadedError(self.stage)
+            if time_left() <= 0:
+                REJECTED.inc(stage=self.stage, reason="deadline")
+                raise DeadlineExceeded(self.stage)
+
+        self.waiting += 1
+        try:
+            remaining = time_left()
+            await asyncio.wait_for(self._semaphore.acquire(), None if remaining == float("inf") else remaining)
+        except asyncio.TimeoutError:
+            REJECTED.inc(stage=self.stage, reason="deadline")
+            raise DeadlineExceeded(self.stage) from None
+        finally:
+            self.waiting -= 1
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._semaphore.release()
+
+
+# Request kinds: path -> (kind, deadline seconds); one in-flight limit per kind
+ROUTES = {
+    "/query": ("query", QUERY_DEADLINE_SECONDS),
+    "/query/stream": ("query", QUERY_DEADLINE_SECONDS),
+    "/query/batch": ("query", BATCH_DEADLINE_SECONDS),
+    "/voice-query": ("voice", VOICE_DEADLINE_SECONDS),
+    "/voice-query-debug": ("voice", VOICE_DEADLINE_SECONDS),
+}
+MAX_IN_FLIGHT = {"query": QUERY_MAX_IN_FLIGHT, "voice": VOICE_MAX_IN_FLIGHT}
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware for the answer endpoints: turns requests away with 429 once
+    too many of their kind are in flight, starts the request's deadline, and
+    adds an X-Degraded header listing the stages that fell back.
+    """
+
+    def __init__(self, app, routes=ROUTES, max_in_flight=MAX_IN_FLIGHT):
+        self.app = app
+        self.routes = routes
+        self.max_in_flight = max_in_flight
+        self.in_flight = {kind: 0 for kind in max_in_flight}
+
+    async def __call__(self, scope, receive, send):
+        route = self.routes.get(scope.get("path")) if scope["type"] == "http" else None
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        kind, deadline_seconds = route
+        if self.in_flight[kind] >= self.max_in_flight[kind]:
+            REJECTED.inc(stage=kind, reason="in_flight")
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [(b"content-type", b"application/json"), (b"retry-after", str(RETRY_AFTER_SECONDS).encode())],
+            })
+            await send({"type": "http.response.body", "body": b'{"detail":"Too many requests in progress, try again shortly"}'})
+            return
+
+        degraded = []
+        deadline_token = request_deadline.set(time.monotonic() + deadline_seconds)
+        degraded_token = request_degraded.set(degraded)
+
+        async def send_with_header(message):
+            if message["type"] == "http.response.start" and degraded:
+                message = dict(message, headers=list(message.get("headers", [])) + [(b"x-degraded", ",".join(degraded).encode())])
+            await send(message)
+
+        self.in_flight[kind] += 1
+        try:
+            await self.app(scope, receive, send_with_header)
+        finally:
+            self.in_flight[kind] -= 1
+            request_deadline.reset(deadline_token)
+            request_degraded.reset(degraded_token)
+
+
+def overloaded_response_headers() -> dict:
+    return {"Retry-After": str(RETRY_AFTER_SECONDS)}
@@ -0,0 +1,119 @@
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+
+# --- Cache settings (tune via env vars) ---
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))  # 0 disables the cache
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))  # seconds
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.92"))  # cosine
+
+
+def normalize_query(text: str) -> str:
+    """Lowercase, unify full/half-width characters, drop punctuation and extra spaces"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+class AnswerCache:
+    """
+    LRU + TTL cache of LLM answers with two hit paths:
+    - exact: same normalized query text
+    - semantic: query embedding close to a cached one AND retrieval returned the same documents
+    """
+
+    def __init__(self, max_entries=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL, similarity=ANSWER_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self._entries = OrderedDict()  # normalized query -> entry dict
+        self._lock = Lock()
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+
+    def _expired(self, entry) -> bool:
+        return time.time() - entry["created"] > self.ttl
+
+    def get(self, query_text: str):
+        """Exact lookup on the normalized query. Returns the answer or None."""
+        key = normalize_query(query_text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.stats["exact_hits"] += 1
+            return entry["answer"]
+
+    def get_similar(self, query_text: str, embedding, doc_ids):
+        """
+        Near-duplicate lookup. Only counts as a hit when the closest cached
+        query also retrieved the same documents, so the answer is grounded
+        in the same context. Returns the answer or None.
+        """
+        query_vector = _unit(embedding)
+        doc_ids = tuple(doc_ids)
+
+        with self._lock:
+            candidates = [
+                (key, entry) for key, entry in self._entries.items()
+                if entry["doc_ids"] == doc_ids and not self._expired(entry)
+            ]
+            if not candidates:
+                self.stats["misses"] += 1
+                return None
+
+            matrix = np.stack([entry["embedding"] for _, entry in candidates])
+            scores = matrix @ query_vector
+            best = int(np.argmax(scores))
+            if scores[best] < self.similarity:
+                self.stats["misses"] += 1
+                return None
+
+            key, entry = candidates[best]
+            self._entries.move_to_end(key)
+            self.stats["semantic_hits"] += 1
+
+        # Remember this phrasing too, so the next identical ask is an exact hit.
+        # It expires with the original answer - a paraphrase doesn't make it fresh.
+        self.put(query_text, entry["answer"], embedding, doc_ids, created=entry["created"])
+        return entry["answer"]
+
+    def put(self, query_text: str, answer: str, embedding, doc_ids, created: float = None):
+        if self.max_entries <= 0:
+            return
+        key = normalize_query(query_text)
+        with self._lock:
+            self._entries[key] = {
+                "answer": answer,
+                "embedding": _unit(embedding),
+                "doc_ids": tuple(doc_ids),
+                "created": time.time() if created is None else created,
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        """Drop everything - call whenever the collection is re-ingested"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _unit(embedding) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+answer_cache = AnswerCache()
@@ -0,0 +1,134 @@
+import os
+import re
+import io
+import json
+import time
+import hashlib
+import zipfile
+from threading import Lock
+
+# --- Offline answer packs (built by `python -m app.pack_builder`) ---
+ANSWER_PACKS_DIR = os.getenv("ANSWER_PACKS_DIR", "./answer_packs")
+ANSWER_PACKS_KEEP = int(os.getenv("ANSWER_PACKS_KEEP", "3"))  # versions kept per area
+
+PACK_FORMAT = 1
+INDEX_FILE = "index.json"
+DEFAULT_AREA = "Kamakura"  # sites whose GPS hint names no known place
+
+QUOTED = re.compile(r"[“\"]([^”\"]+)[”\"]")
+
+
+def area_slug(area: str) -> str:
+    """'Kita-Kamakura Station' -> 'kita-kamakura-station'"""
+    return re.sub(r"[^a-z0-9]+", "-", area.lower()).strip("-")
+
+
+def trigger_questions(title: str, context_triggers: str) -> list:
+    """The phrases visitors are expected to ask about a site, plus the generic intro question"""
+    questions = [f"Tell me about {title.strip()}."]
+    for phrase in QUOTED.findall(context_triggers):
+        phrase = phrase.strip()
+        if phrase and phrase not in questions:
+            questions.append(phrase)
+    return questions
+
+
+def build_pack(area: str, entries: list, audio: dict, info: dict) -> tuple:
+    """
+    Zip one area's answers. entries: [{question, site_id, site_title, answer, audio_key}],
+    audio: audio_key -> MP3 bytes. Returns (version, zip bytes).
+    The version is derived from the content, so an unchanged pack keeps its version.
+    """
+    content_hash = hashlib.sha256(
+        json.dumps(entries, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+    version = content_hash[:12]
+    manifest = {
+        "format": PACK_FORMAT,
+        "area": area,
+        "slug": area_slug(area),
+        "version": version,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        **info,
+        "entries": [
+            dict(entry, audio=f"audio/{entry['audio_key']}.mp3" if entry.get("audio_key") in audio else None)
+            for entry in entries
+        ],
+    }
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as pack:
+        pack.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=1), zipfile.ZIP_DEFLATED)
+        # MP3 is already compressed - store it as is
+        for key, clip in audio.items():
+            pack.writestr(f"audio/{key}.mp3", clip, zipfile.ZIP_STORED)
+    return version, buffer.getvalue()
+
+
+class PackStore:
+    """Versioned answer packs on disk plus an index of the latest version per area"""
+
+    def __init__(self, packs_dir=ANSWER_PACKS_DIR, keep=ANSWER_PACKS_KEEP):
+        self.packs_dir = packs_dir
+        self.keep = keep
+        self._lock = Lock()
+
+    def _index_path(self) -> str:
+        return os.path.join(self.packs_dir, INDEX_FILE)
+
+    def index(self) -> dict:
+        try:
+            with open(self._index_path()) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def save(self, area: str, version: str, data: bytes, entries: int) -> dict:
+        """Write a pack atomically and make it the area's latest version"""
+        slug = area_slug(area)
+        filename = f"{slug}-{version}.zip"
+        os.makedirs(self.packs_dir, exist_ok=True)
+        path = os.path.join(self.packs_dir, filename)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            index = self.index()
+            previous = index.get(slug, {})
+            history = [v for v in previous.get("history", []) if v != version] + [version]
+            index[slug] = {
+                "area": area,
+                "version": version,
+                "file": filename,
+                "bytes": len(data),
+                "sha256": hashlib.sha256(data).hexdigest(),
+                "entries": entries,
+                "updated": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "history": history[-self.keep:],
+            }
+            for old_version in history[:-self.keep]:
+                old_path = os.path.join(self.packs_dir, f"{slug}-{old_version}.zip")
+                if os.path.exists(old_path):
+                    os.remove(old_path)
+
+            tmp_index = f"{self._index_path()}.tmp"
+            with open(tmp_index, "w") as f:
+                json.dump(index, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_index, self._index_path())
+        return index[slug]
+
+    def find(self, slug: str, version: str = None) -> tuple:
+        """(file path, version) of an area's pack - latest unless a kept version is asked for - or (None, None)"""
+        entry = self.index().get(slug)
+        if entry is None:
+            return None, None
+        version = version or entry["version"]
+        if version not in entry.get("history", [entry["version"]]):
+            return None, None
+        path = os.path.join(self.packs_dir, f"{slug}-{version}.zip")
+        return (path, version) if os.path.exists(path) else (None, None)
+
+
+pack_store = PackStore()
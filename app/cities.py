@@ -0,0 +1,269 @@
+import os
+import re
+import glob
+import asyncio
+from collections import OrderedDict
+from threading import Lock
+
+from chromadb.errors import ChromaError
+
+from app.geo import GeoIndex, haversine_km, GEO_RADIUS_KM
+from app.ingest import ingest_csv, has_changes, read_csv, build_record
+from app.warmup import DEFAULT_EMBEDDING_MODEL
+from app.singleflight import SingleFlight
+from app.vector_index import VectorIndex, _fold
+
+# --- Multi-city settings (tune via env vars) ---
+CITY_DATA_DIR = os.getenv("CITY_DATA_DIR", ".")  # where the temples_<city>_v<N>.csv files live
+DEFAULT_CITY = os.getenv("DEFAULT_CITY", "kamakura")  # pre-loaded at startup, and the fallback route
+CITY_MAX_RESIDENT = int(os.getenv("CITY_MAX_RESIDENT", "3"))  # cities kept loaded, least recently used dropped
+CHROMA_MEMORY_LIMIT_MB = int(os.getenv("CHROMA_MEMORY_LIMIT_MB", "512"))  # Chroma's own HNSW segment LRU, 0 = unbounded
+# Sync a city with its CSV when it loads. Off by default: the image's database is synced at
+# build time (python -m app.cities), and uvicorn workers sharing one database must only read it.
+CITY_SYNC_ON_LOAD = os.getenv("CITY_SYNC_ON_LOAD", "false").lower() == "true"
+
+CHROMA_DB_DIR = "./chroma_db"
+
+COLLECTION_PREFIX = "temples_"
+CSV_NAME = re.compile(r"^temples_([a-z0-9]+)_v(\d+)\.csv$")
+
+# Shortest site name used by the classifier - shorter ones match too much by accident
+MIN_KEYWORD_LENGTH = 5
+
+
+class City:
+    """One loaded city: its Chroma collection plus the in-memory indexes built from it"""
+
+    def __init__(self, name, collection, geo_index, vector_index=None):
+        self.name = name
+        self.collection = collection
+        self.geo_index = geo_index
+        self.vector_index = vector_index
+
+
+def route_info(name: str, geo_index: GeoIndex, metadatas: list) -> dict:
+    """
+    What routing needs without loading the city: the centre and reach of its
+    located sites, and the folded site names the classifier looks for.
+    Stored in the collection metadata, so discovery is a single sqlite read.
+    """
+    keywords = {_fold(name)}
+    for metadata in metadatas:
+        metadata = metadata or {}
+        names = [metadata.get("title", "")] + str(metadata.get("alt-names", "")).split(",")
+        keywords.update(folded for folded in map(_fold, names) if len(folded) >= MIN_KEYWORD_LENGTH)
+
+    info = {"city_keywords": "|".join(sorted(keywords))}
+    points = list(geo_index.points.values())
+    if points:
+        lat = sum(point[0] for point in points) / len(points)
+        lon = sum(point[1] for point in points) / len(points)
+        reach = max(haversine_km(lat, lon, point[0], point[1]) for point in points)
+        info.update({"city_lat": lat, "city_lon": lon, "city_radius_km": reach + GEO_RADIUS_KM})
+    return info
+
+
+def csv_route_info(name: str, csv_file: str) -> dict:
+    records = [build_record(row, index, name) for index, row in read_csv(csv_file).iterrows()]
+    metadatas = [metadata for _, _, metadata in records]
+    return route_info(name, GeoIndex([doc_id for doc_id, _, _ in records], metadatas), metadatas)
+
+
+class CityRouter:
+    """
+    Per-city collections in one Chroma database, named temples_<city>.
+    Cities are discovered from the database and the temples_<city>_v<N>.csv
+    files, loaded on first use (and synced with their CSV, if sync_on_load),
+    and at most max_resident stay loaded - so startup and memory don't grow
+    with the number of cities.
+    """
+
+    def __init__(self, chroma_client, embedding_function, engine="chroma", data_dir=CITY_DATA_DIR,
+                 default_city=DEFAULT_CITY, max_resident=CITY_MAX_RESIDENT, sync_on_load=CITY_SYNC_ON_LOAD,
+                 on_changed=None):
+        self.chroma_client = chroma_client
+        self.embedding_function = embedding_function
+        self.model_id = getattr(embedding_function, "model_id", None) or DEFAULT_EMBEDDING_MODEL
+        self.engine = engine
+        self.data_dir = data_dir
+        self.default_city = default_city
+        self.max_resident = max(max_resident, 1)
+        self.sync_on_load = sync_on_load
+        self.on_changed = on_changed  # called after a sync changed a city's documents
+        self.cities = {}  # name -> {"collection": ..., "csv": path or None, "route": {...}}
+        self._resident = OrderedDict()  # name -> City, least recently used first
+        self._lock = Lock()
+        self._loads = SingleFlight("city_load")
+        self._synced = set()  # cities already synced with their CSV by this process
+        self.stats = {"hits": 0, "loads": 0, "evictions": 0}
+
+    def discover(self):
+        """Find every city with a collection or a CSV. Reads metadata only - nothing is loaded."""
+        cities = {}
+        for collection in self.chroma_client.list_collections():
+            # Chroma 0.5 returns collections, 0.6+ returns names
+            collection_name = getattr(collection, "name", collection)
+            if not collection_name.startswith(COLLECTION_PREFIX):
+                continue
+            name = collection_name[len(COLLECTION_PREFIX):]
+            cities[name] = {"collection": collection_name, "csv": None, "route": dict(getattr(collection, "metadata", None) or {})}
+
+        versions = {}
+        for path in glob.glob(os.path.join(self.data_dir, f"{COLLECTION_PREFIX}*_v*.csv")):
+            match = CSV_NAME.match(os.path.basename(path))
+            if not match:
+                continue
+            name, version = match.group(1), int(match.group(2))
+            # Newest version of a city's CSV wins
+            if version > versions.get(name, -1):
+                versions[name] = version
+                cities.setdefault(name, {"collection": f"{COLLECTION_PREFIX}{name}", "csv": None, "route": {}})["csv"] = path
+
+        for name, city in cities.items():
+            # A city that was never loaded has no stored route info yet - read it off its CSV
+            if "city_keywords" not in city["route"] and city["csv"]:
+                city["route"].update(csv_route_info(name, city["csv"]))
+            city["route"].setdefault("city_keywords", _fold(name))
+        self.cities = cities
+        return sorted(cities)
+
+    def csv_file(self, name: str):
+        return self.cities[name]["csv"]
+
+    # --- Routing: explicit city, then location, then the question itself ---
+    def route(self, query_text: str = "", location: tuple = None, city: str = None) -> str:
+        if city is not None:
+            return city
+        if location is not None:
+            by_location = self.city_at(*location)
+            if by_location is not None:
+                return by_location
+        return self.classify(query_text) or self.default_city
+
+    def city_at(self, lat: float, lon: float):
+        """Closest city whose sites reach the point, or None"""
+        best, best_km = None, None
+        for name, city in self.cities.items():
+            route = city["route"]
+            if "city_lat" not in route:
+                continue
+            km = haversine_km(lat, lon, route["city_lat"], route["city_lon"])
+            if km <= route["city_radius_km"] and (best_km is None or km < best_km):
+                best, best_km = name, km
+        return best
+
+    def classify(self, query_text: str):
+        """
+        The city whose name or site names appear in the question, longest match
+        wins ("Todaiji" -> nara). None when nothing matches.
+        """
+        folded = _fold(query_text)
+        best, best_score = None, 0
+        for name, city in self.cities.items():
+            score = max((len(keyword) for keyword in city["route"]["city_keywords"].split("|") if keyword in folded), default=0)
+            if score > best_score:
+                best, best_score = name, score
+        return best
+
+    # --- Residency ---
+    def resident(self) -> list:
+        return list(self._resident)
+
+    async def get(self, name: str) -> City:
+        """The loaded city, loading it on first use; concurrent first requests share one load"""
+        city = self._touch(name)
+        if city is not None:
+            return city
+        return await self._loads.do(name, lambda: asyncio.to_thread(self.load, name))
+
+    def _touch(self, name: str):
+        with self._lock:
+            city = self._resident.get(name)
+            if city is not None:
+                self._resident.move_to_end(name)
+                self.stats["hits"] += 1
+            return city
+
+    def load(self, name: str) -> City:
+        """Blocking: open the city's collection (syncing it with its CSV if sync_on_load) and build the indexes"""
+        if name not in self.cities:
+            raise KeyError(f"Unknown city '{name}'")
+        spec = self.cities[name]
+
+        print(f"🔄 Loading city '{name}' (collection '{spec['collection']}')...")
+        if self.sync_on_load:
+            collection = self.chroma_client.get_or_create_collection(spec["collection"], embedding_function=self.embedding_function)
+            # Once per process - reloading an evicted city skips it
+            if spec["csv"] and name not in self._synced:
+                self.sync(name, collection)
+        else:
+            try:
+                collection = self.chroma_client.get_collection(spec["collection"], embedding_function=self.embedding_function)
+            except (ValueError, ChromaError):  # not found: ValueError before Chroma 0.5.6, ChromaError since
+                raise KeyError(f"City '{name}' has no collection yet - run python -m app.cities") from None
+
+        data = collection.get(include=["metadatas"])
+        models = {(metadata or {}).get("embedding_model", DEFAULT_EMBEDDING_MODEL) for metadata in data["metadatas"]}
+        if models - {self.model_id}:
+            print(f"⚠️ City '{name}' was embedded with {', '.join(sorted(models))} but queries use {self.model_id} "
+                  f"- re-sync it (python -m app.cities) or retrieval quality drops")
+        geo_index = GeoIndex(data["ids"], data["metadatas"])
+        print(f"✅ Geo index built for '{name}' ({len(geo_index)} located sites)")
+
+        vector_index = None
+        if self.engine == "numpy":
+            vector_index = VectorIndex.from_collection(collection)
+            print(f"✅ NumPy vector index built for '{name}' ({len(vector_index)} documents)")
+
+        self._save_route(name, collection, route_info(name, geo_index, data["metadatas"]), persist=self.sync_on_load)
+
+        city = City(name, collection, geo_index, vector_index)
+        with self._lock:
+            self._resident[name] = city
+            self._resident.move_to_end(name)
+            self.stats["loads"] += 1
+            while len(self._resident) > self.max_resident:
+                evicted, _ = self._resident.popitem(last=False)
+                self.stats["evictions"] += 1
+                print(f"♻️ City '{evicted}' unloaded (keeping {self.max_resident} resident)")
+        return city
+
+    def sync(self, name: str, collection) -> dict:
+        """Incremental sync with the city's CSV: only new/changed rows get embedded"""
+        spec = self.cities[name]
+        ingest_stats = ingest_csv(collection, spec["csv"], name, model_id=self.model_id)
+        if has_changes(ingest_stats) and self.on_changed is not None:
+            self.on_changed(name)
+        self._synced.add(name)
+        print(f"✅ {spec['csv']} synced with Chroma collection '{spec['collection']}': {ingest_stats}")
+        return ingest_stats
+
+    def _save_route(self, name: str, collection, route: dict, persist: bool = True):
+        spec = self.cities[name]
+        spec["route"] = {**spec["route"], **route}
+        metadata = dict(collection.metadata or {})
+        if not persist or all(metadata.get(key) == value for key, value in route.items()):
+            return
+        # Chroma rejects any modify that includes the distance function, and
+        # modify replaces the whole metadata - so leave such collections alone
+        if any(key.startswith("hnsw:") for key in metadata):
+            return
+        collection.modify(metadata={**metadata, **route})
+
+
+def sync_all(chroma_client, embedding_function, data_dir=CITY_DATA_DIR) -> list:
+    """Sync every city that has a CSV into the database (and store its route info). Single process only."""
+    router = CityRouter(chroma_client, embedding_function, data_dir=data_dir, sync_on_load=True)
+    synced = [name for name in router.discover() if router.csv_file(name)]
+    for name in synced:
+        router.load(name)
+    return synced
+
+
+if __name__ == "__main__":
+    # Image build step: the workers then start against an already-synced, read-only database
+    import chromadb
+    from app.warmup import load_embedding_function
+
+    cities = sync_all(chromadb.PersistentClient(path=CHROMA_DB_DIR), load_embedding_function())
+    print(f"✅ Cities synced: {', '.join(cities)}")
@@ -0,0 +1,85 @@
+import os
+import importlib.util
+import httpx
+from openai import AsyncOpenAI
+from elevenlabs import AsyncElevenLabs
+
+# --- Connection pool settings (tune via env vars) ---
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "30"))
+ELEVENLABS_TIMEOUT = float(os.getenv("ELEVENLABS_TIMEOUT", "30"))
+
+# Point at a stand-in server (e.g. bench/fake_upstreams.py). OpenAI reads OPENAI_BASE_URL itself.
+ELEVENLABS_BASE_URL = os.getenv("ELEVENLABS_BASE_URL") or None
+
+# HTTP/2 needs the optional `h2` package (httpx[http2])
+HTTP2_ENABLED = (
+    os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+    and importlib.util.find_spec("h2") is not None
+)
+
+
+def _make_http_client(timeout: float) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=HTTP2_ENABLED,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(timeout, connect=HTTP_CONNECT_TIMEOUT),
+    )
+
+
+class ClientRegistry:
+    """
+    App-scoped OpenAI and ElevenLabs clients. Created once in the FastAPI
+    lifespan so every request reuses the same keep-alive connection pools.
+    """
+
+    def __init__(self):
+        self._openai = None
+        self._elevenlabs = None
+        self._http_clients = []
+
+    async def start(self):
+        openai_key = os.getenv("OPENAI_API_KEY")
+        if openai_key:
+            http_client = _make_http_client(OPENAI_TIMEOUT)
+            self._http_clients.append(http_client)
+            self._openai = AsyncOpenAI(api_key=openai_key, http_client=http_client)
+
+        elevenlabs_key = os.getenv("ELEVENLABS_API_KEY")
+        if elevenlabs_key:
+            http_client = _make_http_client(ELEVENLABS_TIMEOUT)
+            self._http_clients.append(http_client)
+            self._elevenlabs = AsyncElevenLabs(
+                api_key=elevenlabs_key, base_url=ELEVENLABS_BASE_URL, httpx_client=http_client
+            )
+
+        print(f"✅ API clients ready (HTTP/2: {HTTP2_ENABLED})")
+
+    async def close(self):
+        for http_client in self._http_clients:
+            await http_client.aclose()
+        self._http_clients = []
+        self._openai = None
+        self._elevenlabs = None
+
+    @property
+    def openai(self) -> AsyncOpenAI:
+        if self._openai is None:
+            raise ValueError("OPENAI_API_KEY environment variable is missing!")
+        return self._openai
+
+    @property
+    def elevenlabs(self) -> AsyncElevenLabs:
+        if self._elevenlabs is None:
+            raise ValueError("ELEVENLABS_API_KEY environment variable is missing!")
+        return self._elevenlabs
+
+
+clients = ClientRegistry()
@@ -0,0 +1,44 @@
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from app.admission import AdmissionSemaphore
+
+# --- Per-stage concurrency limits (tune via env vars) ---
+STT_MAX_CONCURRENCY = int(os.getenv("STT_MAX_CONCURRENCY", "2"))
+RETRIEVAL_MAX_CONCURRENCY = int(os.getenv("RETRIEVAL_MAX_CONCURRENCY", "4"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+TTS_MAX_CONCURRENCY = int(os.getenv("TTS_MAX_CONCURRENCY", "16"))
+
+# Bounded queues: callers waiting beyond these are rejected (503) instead of piling up
+STT_MAX_QUEUE = int(os.getenv("STT_MAX_QUEUE", "32"))  # clips being transcribed or waiting for a batch
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "64"))
+TTS_MAX_QUEUE = int(os.getenv("TTS_MAX_QUEUE", "64"))
+
+# LLM calls a single /query/batch request may have in flight (the global LLM cap still applies)
+QUERY_BATCH_CONCURRENCY = int(os.getenv("QUERY_BATCH_CONCURRENCY", "8"))
+
+# Whisper is CPU-bound, so it gets its own small pool instead of sharing
+# the default executor that Starlette also uses for sync endpoints.
+stt_executor = ThreadPoolExecutor(max_workers=STT_MAX_CONCURRENCY, thread_name_prefix="stt")
+retrieval_executor = ThreadPoolExecutor(max_workers=RETRIEVAL_MAX_CONCURRENCY, thread_name_prefix="retrieval")
+
+# The network-bound stages run on the event loop; semaphores cap how many
+# upstream calls we have in flight at once, and how many may queue for one.
+llm_semaphore = AdmissionSemaphore("llm", LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE)
+tts_semaphore = AdmissionSemaphore("tts", TTS_MAX_CONCURRENCY, TTS_MAX_QUEUE)
+# The STT pool has its own small executor and the batcher's queue in front of
+# it, so this only caps the clips admitted to either
+stt_semaphore = AdmissionSemaphore("stt", STT_MAX_QUEUE, 0)
+
+
+async def run_stt(fn, *args):
+    """Run a blocking speech-to-text call on the dedicated STT pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(stt_executor, fn, *args)
+
+
+async def run_retrieval(fn, *args):
+    """Run a blocking Chroma call (embedding + HNSW) on the retrieval pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(retrieval_executor, fn, *args)
@@ -0,0 +1,124 @@
+import os
+import re
+
+from app.streaming import SENTENCE_END
+from app.vector_index import _bigrams
+
+# Approximate token budget for the retrieved context in the user message
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "600"))
+
+NO_CONTEXT = "Sorry, I don't have information on that topic yet."
+
+# Sentences of the top source used when the LLM is unavailable
+FALLBACK_SENTENCES = 2
+
+CJK = re.compile(r"[぀-ヿ㐀-鿿＀-￯]")
+QUOTES = "“”\"'"
+
+
+def count_tokens(text: str) -> int:
+    """
+    Cheap token estimate, no tokenizer needed: ~4 characters per token for
+    English, ~1 token per character for Japanese. Only used for budgeting.
+    """
+    cjk = len(CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def document_content(document: str) -> str:
+    """The "Content:" section of a combined document (see app/ingest.py build_record)"""
+    match = re.search(r"^Content: (.*?)(?=^\w[\w ]*: |\Z)", document, re.MULTILINE | re.DOTALL)
+    return match.group(1).strip() if match else document.strip()
+
+
+def nearby_hint(context_triggers: str) -> str:
+    """'GPS: near Hase Station; User asks ...' -> 'near Hase Station'"""
+    first = context_triggers.split(";")[0].strip()
+    return first[4:].strip() if first.upper().startswith("GPS:") else ""
+
+
+def clean_nudge(nudge: str) -> str:
+    nudge = nudge.strip().strip(QUOTES).strip()
+    return "" if nudge.lower() == "nan" else nudge
+
+
+def select_passages(content: str, query_text: str, budget: int) -> str:
+    """
+    Whole content when it fits. Otherwise the opening sentence plus the
+    sentences sharing the most character bigrams with the query, kept in
+    their original order.
+    """
+    if count_tokens(content) <= budget:
+        return content
+
+    sentences = [s for s in SENTENCE_END.split(content) if s.strip()]
+    query_grams = _bigrams(query_text)
+    ranked = sorted(
+        range(1, len(sentences)),
+        key=lambda i: len(_bigrams(sentences[i]) & query_grams),
+        reverse=True,
+    )
+    chosen = {0}
+    used = count_tokens(sentences[0])
+    for i in ranked:
+        cost = count_tokens(sentences[i])
+        if used + cost <= budget:
+            chosen.add(i)
+            used += cost
+    return " ".join(sentences[i].strip() for i in sorted(chosen))
+
+
+def document_block(document: str, metadata: dict, query_text: str, budget: int) -> str:
+    """
+    One source, reduced to the fields that help answer: title, category, other
+    names, where it is, and the content. Context triggers are retrieval cues and
+    the nudge goes into the shared tips section, so neither is repeated here.
+    """
+    title = metadata.get("title", "")
+    lines = [f"## {title}" if title else "## Source"]
+    if metadata.get("category"):
+        lines.append(f"Category: {metadata['category']}")
+    if metadata.get("alt-names"):
+        lines.append(f"Also called: {metadata['alt-names']}")
+    nearby = nearby_hint(metadata.get("context_triggers", ""))
+    if nearby:
+        lines.append(f"Location: {nearby}")
+
+    header_cost = count_tokens("\n".join(lines))
+    lines.append(select_passages(document_content(document), query_text, max(budget - header_cost, 0)))
+    return "\n".join(lines)
+
+
+def build_context(query_text: str, documents: list, metadatas: list, budget: int = CONTEXT_TOKEN_BUDGET) -> str:
+    """
+    Retrieved documents as a compact context block within roughly `budget` tokens.
+    Sources stay in rank order, best match first, so the LLM knows which one the
+    question is most likely about.
+    """
+    if not documents:
+        return NO_CONTEXT
+
+    sources = [(document, metadata or {}) for document, metadata in zip(documents, metadatas)]
+
+    # Each sustainability nudge appears once, in one section at the end
+    nudges = []
+    for _, metadata in sources:
+        nudge = clean_nudge(metadata.get("sustainability_nudge", ""))
+        if nudge and nudge not in nudges:
+            nudges.append(nudge)
+    tips = "🌱 Sustainability Tips:\n" + "\n".join(f"• {nudge}" for nudge in nudges) if nudges else ""
+
+    per_document = max((budget - count_tokens(tips)) // len(documents), 0)
+    blocks = [document_block(document, metadata, query_text, per_document) for document, metadata in sources]
+    return "\n\n".join(blocks + ([tips] if tips else []))
+
+
+def fallback_answer(documents: list) -> str:
+    """
+    Degraded answer when the LLM can't be used: the opening sentences of the
+    best-matching source.
+    """
+    if not documents:
+        return NO_CONTEXT
+    sentences = [s.strip() for s in SENTENCE_END.split(document_content(documents[0])) if s.strip()]
+    return " ".join(sentences[:FALLBACK_SENTENCES]) or NO_CONTEXT
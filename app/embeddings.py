@@ -0,0 +1,124 @@
+import os
+import asyncio
+from collections import OrderedDict
+from threading import Lock
+
+from chromadb.api.types import EmbeddingFunction
+
+from app.answer_cache import normalize_query
+from app.concurrency import run_retrieval
+
+# --- Query embedding settings (tune via env vars) ---
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))  # query vectors kept, 0 disables the cache
+EMBEDDING_BATCHING = os.getenv("EMBEDDING_BATCHING", "true").lower() == "true"
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))
+
+
+class CachedEmbeddingFunction(EmbeddingFunction):
+    """
+    Wraps the embedding function handed to Chroma. Calls from Chroma itself
+    (documents on ingest) pass straight through. Query text goes through
+    embed_queries instead, which:
+    - serves repeats from an LRU keyed by the normalized text
+    - embeds the misses of concurrent requests together, one model call per
+      batch, flushed at max_batch_size texts or after max_wait_ms
+    """
+
+    def __init__(self, embedding_function, cache_size=EMBEDDING_CACHE_SIZE, batching=EMBEDDING_BATCHING,
+                 max_batch_size=EMBEDDING_BATCH_SIZE, max_wait_ms=EMBEDDING_BATCH_MAX_WAIT_MS):
+        self.embedding_function = embedding_function
+        self.model_id = getattr(embedding_function, "model_id", None)
+        self.cache_size = cache_size
+        self.batching = batching
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._cache = OrderedDict()  # normalized text -> embedding
+        self._lock = Lock()
+        self._pending = []  # [(text, future)]
+        self._timer = None
+        self.stats = {"hits": 0, "misses": 0, "batches": 0}
+
+    def __call__(self, input):
+        return self.embedding_function(input)
+
+    async def embed_queries(self, texts: list) -> list:
+        """One embedding per text, in order"""
+        keys = [normalize_query(text) for text in texts]
+        embeddings = [self._get(key) for key in keys]
+
+        # Each distinct missing text is embedded once, however often it repeats
+        misses = {}
+        for text, key, embedding in zip(texts, keys, embeddings):
+            if embedding is None:
+                misses.setdefault(key, text)
+        self.stats["hits"] += len(texts) - sum(embedding is None for embedding in embeddings)
+        self.stats["misses"] += len(misses)
+
+        if misses:
+            if self.batching:
+                computed = await asyncio.gather(*(self._submit(text) for text in misses.values()))
+            else:
+                computed = await self._embed(list(misses.values()))
+            for key, embedding in zip(misses, computed):
+                self._put(key, embedding)
+            by_key = dict(zip(misses, computed))
+            embeddings = [by_key[key] if embedding is None else embedding for key, embedding in zip(keys, embeddings)]
+        return embeddings
+
+    async def _embed(self, texts: list) -> list:
+        self.stats["batches"] += 1
+        return list(await run_retrieval(self.embedding_function, texts))
+
+    def _get(self, key: str):
+        with self._lock:
+            embedding = self._cache.get(key)
+            if embedding is not None:
+                self._cache.move_to_end(key)
+            return embedding
+
+    def _put(self, key: str, embedding):
+        if self.cache_size <= 0:
+            return
+        with self._lock:
+            self._cache[key] = embedding
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    # --- Micro-batching across concurrent requests (same scheme as app/stt_batcher.py) ---
+    async def _submit(self, text: str):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: list):
+        try:
+            embeddings = await self._embed([text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), embedding in zip(batch, embeddings):
+            if not future.done():
+                future.set_result(embedding)
+
+    def __len__(self):
+        return len(self._cache)
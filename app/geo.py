@@ -0,0 +1,229 @@
+import os
+import re
+import math
+import time
+import asyncio
+from collections import defaultdict
+
+from app.vector_index import _fold
+
+# --- Location-aware retrieval settings (tune via env vars) ---
+GEO_RADIUS_KM = float(os.getenv("GEO_RADIUS_KM", "1.5"))  # "nearby" for a walking tourist
+GEO_BOOST = float(os.getenv("GEO_BOOST", "0.1"))  # subtracted from the distance of the closest sites
+GEO_CELL_KM = float(os.getenv("GEO_CELL_KM", "1.0"))  # grid cell size of the spatial index
+GEO_CANDIDATES = int(os.getenv("GEO_CANDIDATES", "3"))  # x n_results fetched before the proximity re-rank
+GEO_PREFETCH = os.getenv("GEO_PREFETCH", "true").lower() == "true"
+GEO_PREFETCH_SITES = int(os.getenv("GEO_PREFETCH_SITES", "3"))
+GEO_PREFETCH_TTL = float(os.getenv("GEO_PREFETCH_TTL", "3600"))  # seconds
+
+KM_PER_DEGREE = 111.32
+
+# Per-city gazetteers for the CSV's "GPS: ..." hints: place name -> (lat, lon),
+# and folded spelling -> place name. A city's CSV is only matched against its own
+# gazetteer, on whole words, longest spelling first, so "Kita-Kamakura Station"
+# wins over "Kamakura Station" and Nara's "Hasedera Station" is not Kamakura's Hase.
+PLACES = {
+    "kamakura": {
+        "Kamakura Station": (35.3192, 139.5503),
+        "Kita-Kamakura Station": (35.3371, 139.5457),
+        "Hase Station": (35.3122, 139.5360),
+        "Yuigahama Station": (35.3124, 139.5425),
+        "Gokurakuji Station": (35.3094, 139.5302),
+        "Enoshima Station": (35.3115, 139.4876),
+        "Koshigoe Station": (35.3087, 139.4882),
+        "Enoshima Island": (35.2992, 139.4800),
+        "Zaimokuza": (35.3087, 139.5560),
+        "Omachi": (35.3150, 139.5560),
+        "Nikaido": (35.3280, 139.5630),
+        "East Kamakura": (35.3200, 139.5680),
+        "Kamegayatsu-zaka Pass": (35.3300, 139.5480),
+        "Daibutsu Hiking Trail": (35.3240, 139.5330),
+    },
+}
+PLACE_SPELLINGS = {
+    "kamakura": {
+        "kitakamakurastation": "Kita-Kamakura Station",
+        "kitakamakura": "Kita-Kamakura Station",
+        "kamakurastation": "Kamakura Station",
+        "kamakurastations": "Kamakura Station",
+        "komachi": "Kamakura Station",
+        "centralkamakura": "Kamakura Station",
+        "kamakuracityhall": "Kamakura Station",
+        "hasestation": "Hase Station",
+        "hasearea": "Hase Station",
+        "hasedera": "Hase Station",
+        "yuigahama": "Yuigahama Station",
+        "gokurakuji": "Gokurakuji Station",
+        "enoshimastation": "Enoshima Station",
+        "enoshimaisland": "Enoshima Island",
+        "koshigoe": "Koshigoe Station",
+        "zaimokuza": "Zaimokuza",
+        "omachi": "Omachi",
+        "nikaido": "Nikaido",
+        "eastkamakura": "East Kamakura",
+        "kamakuraeasthills": "East Kamakura",
+        "kamakuraeasternhills": "East Kamakura",
+        "kamegayatsuzaka": "Kamegayatsu-zaka Pass",
+        "daibutsuhikingtrail": "Daibutsu Hiking Trail",
+    },
+}
+
+
+def parse_location(context_triggers: str, city: str) -> dict:
+    """
+    'GPS: near Hase Station; User asks ...' -> {"station": "Hase Station", "lat": ..., "lon": ...}.
+    Returns {} when the city has no gazetteer or the hint names no place in it (e.g. "in Kamakura's hills").
+    """
+    hint = context_triggers.split(";")[0]
+    spellings = PLACE_SPELLINGS.get(city, {})
+    if not spellings or not hint.strip().upper().startswith("GPS:"):
+        return {}
+    words = [word for word in map(_fold, re.split(r"[\W_]+", hint.replace("’s", "").replace("'s", ""))) if word]
+    # Every run of whole words, so "omachi" can't match inside "komachi"
+    runs = {"".join(words[start:end]) for start in range(len(words)) for end in range(start + 1, len(words) + 1)}
+    matches = sorted(runs & spellings.keys(), key=len, reverse=True)
+    if not matches:
+        return {}
+    station = spellings[matches[0]]
+    lat, lon = PLACES[city][station]
+    return {"station": station, "lat": lat, "lon": lon}
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(a))
+
+
+def bounding_box(lat: float, lon: float, radius_km: float) -> dict:
+    """Chroma `where` filter for documents inside the box around a point"""
+    dlat = radius_km / KM_PER_DEGREE
+    dlon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    return {"$and": [
+        {"lat": {"$gte": lat - dlat}}, {"lat": {"$lte": lat + dlat}},
+        {"lon": {"$gte": lon - dlon}}, {"lon": {"$lte": lon + dlon}},
+    ]}
+
+
+def cache_scope(lat: float, lon: float) -> str:
+    """Coarse (~1 km) location label, so cached answers are only reused close by"""
+    return f"near {lat:.2f} {lon:.2f}"
+
+
+class GeoIndex:
+    """
+    Grid index over the documents' coordinates: a lookup only visits the
+    cells that overlap the search radius instead of every document.
+    """
+
+    def __init__(self, ids, metadatas, cell_km=GEO_CELL_KM):
+        self.cell_deg = cell_km / KM_PER_DEGREE
+        self.points = {}  # doc id -> (lat, lon, title)
+        self.cells = defaultdict(list)
+        for doc_id, metadata in zip(ids, metadatas):
+            metadata = metadata or {}
+            if "lat" not in metadata or "lon" not in metadata:
+                continue
+            lat, lon = float(metadata["lat"]), float(metadata["lon"])
+            self.points[doc_id] = (lat, lon, metadata.get("title", ""))
+            self.cells[self._cell(lat, lon)].append(doc_id)
+
+    @classmethod
+    def from_collection(cls, collection, **kwargs):
+        data = collection.get(include=["metadatas"])
+        return cls(data["ids"], data["metadatas"], **kwargs)
+
+    def _cell(self, lat: float, lon: float) -> tuple:
+        return int(lat // self.cell_deg), int(lon // self.cell_deg)
+
+    def nearby(self, lat: float, lon: float, radius_km: float = GEO_RADIUS_KM) -> list:
+        """(doc_id, km) for every document within radius_km, closest first"""
+        lat_span = math.ceil(radius_km / KM_PER_DEGREE / self.cell_deg)
+        lon_span = math.ceil(lat_span / max(math.cos(math.radians(lat)), 0.01))
+        row, col = self._cell(lat, lon)
+
+        found = []
+        for r in range(row - lat_span, row + lat_span + 1):
+            for c in range(col - lon_span, col + lon_span + 1):
+                for doc_id in self.cells.get((r, c), ()):
+                    doc_lat, doc_lon, _ = self.points[doc_id]
+                    km = haversine_km(lat, lon, doc_lat, doc_lon)
+                    if km <= radius_km:
+                        found.append((doc_id, km))
+        return sorted(found, key=lambda item: item[1])
+
+    def title(self, doc_id: str) -> str:
+        return self.points[doc_id][2]
+
+    def __len__(self):
+        return len(self.points)
+
+
+def within_radius(results: dict, nearby: dict) -> dict:
+    """Keep only one query's results that are in `nearby` (the exact radius, not the bounding box)"""
+    keep = [i for i, doc_id in enumerate(results["ids"][0]) if doc_id in nearby]
+    return {key: [[results[key][0][i] for i in keep]] for key in results}
+
+
+def merge_results(results: dict, extra: dict) -> dict:
+    """Union of two result sets for one query, by id, ordered by distance"""
+    seen = set(results["ids"][0])
+    added = [i for i, doc_id in enumerate(extra["ids"][0]) if doc_id not in seen]
+    merged = {key: [results[key][0] + [extra[key][0][i] for i in added]] for key in results}
+    order = sorted(range(len(merged["ids"][0])), key=lambda i: merged["distances"][0][i])
+    return {key: [[merged[key][0][i] for i in order]] for key in merged}
+
+
+def boost_results(results: dict, nearby: dict, n_results: int, radius_km: float = GEO_RADIUS_KM, boost: float = GEO_BOOST) -> dict:
+    """
+    Re-rank one query's Chroma-shaped results: sites closer to the user get up to
+    `boost` taken off their distance, then keep the top n_results.
+    """
+    ids = results["ids"][0]
+    adjusted = [
+        distance - boost * max(0.0, 1 - nearby[doc_id] / radius_km) if doc_id in nearby else distance
+        for doc_id, distance in zip(ids, results["distances"][0])
+    ]
+    order = sorted(range(len(ids)), key=lambda i: adjusted[i])[:n_results]
+    reranked = {key: [[results[key][0][i] for i in order]] for key in results if key != "distances"}
+    reranked["distances"] = [[adjusted[i] for i in order]]
+    return reranked
+
+
+class NearbyPrefetcher:
+    """
+    When a user is near a cluster of sites, answer "Tell me about <site>" for the
+    closest few in the background, so the likely next question is a cache hit.
+    Each (site, area) is warmed at most once per GEO_PREFETCH_TTL, and only
+    while the LLM has spare capacity.
+    """
+
+    def __init__(self, warm, is_busy, sites=GEO_PREFETCH_SITES, ttl=GEO_PREFETCH_TTL):
+        self.warm = warm  # async (title, location) -> None
+        self.is_busy = is_busy
+        self.sites = sites
+        self.ttl = ttl
+        self._warmed = {}  # (doc_id, scope) -> time
+        self._tasks = set()
+        self.stats = {"scheduled": 0, "skipped_recent": 0, "skipped_busy": 0}
+
+    def schedule(self, geo_index: GeoIndex, nearby: list, location: tuple):
+        now = time.time()
+        scope = cache_scope(*location)
+        for doc_id, _ in nearby[:self.sites]:
+            key = (doc_id, scope)
+            if now - self._warmed.get(key, 0) < self.ttl:
+                self.stats["skipped_recent"] += 1
+                continue
+            if self.is_busy():
+                self.stats["skipped_busy"] += 1
+                return
+            self._warmed[key] = now
+            self.stats["scheduled"] += 1
+            task = asyncio.create_task(self.warm(geo_index.title(doc_id), location))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        # Forget expired entries so the map stays bounded
+        if len(self._warmed) > 10_000:
+            self._warmed = {key: ts for key, ts in self._warmed.items() if now - ts < self.ttl}
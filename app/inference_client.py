@@ -0,0 +1,123 @@
+import os
+import json
+import time
+import socket
+import struct
+import asyncio
+
+import numpy as np
+from chromadb.api.types import EmbeddingFunction
+
+from app.admission import OverloadedError
+from app.stt import UnsupportedAudioError
+
+# Set to the sidecar's socket path to make this worker a thin client (see app/inference_server.py)
+INFERENCE_SOCKET = os.getenv("INFERENCE_SOCKET") or None
+INFERENCE_TIMEOUT = float(os.getenv("INFERENCE_TIMEOUT", "60"))
+
+# --- Wire format ---
+# Every message is: 4-byte big-endian header length, JSON header, then
+# header["payload_bytes"] raw bytes (audio in, float32 embeddings out).
+_LENGTH = struct.Struct(">I")
+
+
+class InferenceBusyError(OverloadedError):
+    """The sidecar's queue is full - shed the request instead of waiting"""
+
+
+def encode_frame(header: dict, payload: bytes = b"") -> bytes:
+    header = dict(header, payload_bytes=len(payload))
+    header_bytes = json.dumps(header).encode("utf-8")
+    return _LENGTH.pack(len(header_bytes)) + header_bytes + payload
+
+
+async def read_frame(reader: asyncio.StreamReader) -> tuple:
+    (header_length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+    header = json.loads(await reader.readexactly(header_length))
+    payload = await reader.readexactly(header["payload_bytes"]) if header["payload_bytes"] else b""
+    return header, payload
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise ConnectionError("Inference sidecar closed the connection")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _check(header: dict):
+    if header.get("ok"):
+        return
+    if header.get("error") == "busy":
+        raise InferenceBusyError("inference sidecar")
+    if header.get("error") == "unsupported_audio":
+        raise UnsupportedAudioError()
+    raise RuntimeError(f"Inference sidecar error: {header.get('error')}")
+
+
+class InferenceClient:
+    """Talks to the inference sidecar over its Unix socket (one connection per request)"""
+
+    def __init__(self, socket_path: str = INFERENCE_SOCKET, timeout: float = INFERENCE_TIMEOUT):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    async def request(self, header: dict, payload: bytes = b"") -> tuple:
+        reader, writer = await asyncio.open_unix_connection(self.socket_path)
+        try:
+            writer.write(encode_frame(header, payload))
+            await writer.drain()
+            response, response_payload = await asyncio.wait_for(read_frame(reader), self.timeout)
+        finally:
+            writer.close()
+        _check(response)
+        return response, response_payload
+
+    def request_blocking(self, header: dict, payload: bytes = b"") -> tuple:
+        """Same as request(), for sync callers such as Chroma's embedding function"""
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            sock.sendall(encode_frame(header, payload))
+            (header_length,) = _LENGTH.unpack(_recv_exactly(sock, _LENGTH.size))
+            response = json.loads(_recv_exactly(sock, header_length))
+            response_payload = _recv_exactly(sock, response["payload_bytes"]) if response["payload_bytes"] else b""
+        _check(response)
+        return response, response_payload
+
+    async def transcribe(self, content: bytes, profile: str = None) -> tuple:
+        response, _ = await self.request({"op": "transcribe", "profile": profile}, content)
+        return response["text"], response["details"]
+
+    def embed_blocking(self, texts: list) -> np.ndarray:
+        response, payload = self.request_blocking({"op": "embed", "texts": list(texts)})
+        return np.frombuffer(payload, dtype=np.float32).reshape(response["shape"])
+
+    async def wait_until_ready(self, timeout: float = 300):
+        """Block worker startup until the sidecar has its models loaded"""
+        deadline = time.time() + timeout
+        while True:
+            try:
+                response, _ = await self.request({"op": "ping"})
+                if response.get("ready"):
+                    return
+            except (OSError, ConnectionError):
+                pass
+            if time.time() > deadline:
+                raise TimeoutError(f"Inference sidecar at {self.socket_path} not ready after {timeout}s")
+            await asyncio.sleep(0.5)
+
+
+class SidecarEmbeddingFunction(EmbeddingFunction):
+    """Chroma embedding function backed by the sidecar's shared embedding model"""
+
+    def __init__(self, client: InferenceClient, model_id: str):
+        self.client = client
+        self.model_id = model_id  # the sidecar's model, for the collection sync
+
+    def __call__(self, input):
+        return list(self.client.embed_blocking(input))
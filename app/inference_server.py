@@ -0,0 +1,100 @@
+"""
+Shared STT/embedding inference sidecar.
+
+One process owns Whisper and the embedding model; uvicorn workers send it
+transcription and embedding requests over a Unix socket instead of loading
+their own copies. Run it next to the API workers:
+
+    python -m app.inference_server &
+    INFERENCE_SOCKET=/tmp/japanaut-inference.sock uvicorn app.main:app --workers 4
+"""
+import os
+import time
+import asyncio
+
+import numpy as np
+
+from app import stt
+from app.concurrency import run_retrieval
+from app.stt_batcher import transcribe_upload
+from app.warmup import warm_embedding_model, load_embedding_function
+from app.inference_client import encode_frame, read_frame
+
+SOCKET_PATH = os.getenv("INFERENCE_SOCKET") or "/tmp/japanaut-inference.sock"
+
+# Requests allowed in flight before new ones are turned away as "busy"
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "32"))
+
+
+class InferenceServer:
+    def __init__(self, max_queue: int = INFERENCE_MAX_QUEUE):
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.ready = False
+        self.embedding_fn = load_embedding_function()
+        self.stats = {"requests": 0, "rejected": 0, "errors": 0}
+
+    async def load_models(self):
+        start = time.time()
+        await asyncio.gather(
+            asyncio.to_thread(warm_embedding_model, self.embedding_fn),
+            asyncio.to_thread(stt.get_model),
+        )
+        self.ready = True
+        print(f"✅ Inference models loaded in {time.time() - start:.2f}s")
+
+    async def dispatch(self, header: dict, payload: bytes) -> tuple:
+        op = header.get("op")
+        if op == "transcribe":
+            text, details = await transcribe_upload(payload, header.get("profile"))
+            return {"ok": True, "text": text, "details": details}, b""
+        if op == "embed":
+            embeddings = await run_retrieval(self.embedding_fn, header["texts"])
+            matrix = np.asarray(embeddings, dtype=np.float32)
+            return {"ok": True, "shape": list(matrix.shape)}, matrix.tobytes()
+        return {"ok": False, "error": f"unknown op '{op}'"}, b""
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    header, payload = await read_frame(reader)
+                except asyncio.IncompleteReadError:
+                    break  # client closed the connection
+
+                if header.get("op") == "ping":
+                    response = ({"ok": True, "ready": self.ready, "in_flight": self.in_flight, **self.stats}, b"")
+                elif not self.ready or self.in_flight >= self.max_queue:
+                    # Backpressure: fail fast so the worker can shed load
+                    self.stats["rejected"] += 1
+                    response = ({"ok": False, "error": "busy"}, b"")
+                else:
+                    self.in_flight += 1
+                    self.stats["requests"] += 1
+                    try:
+                        response = await self.dispatch(header, payload)
+                    except stt.UnsupportedAudioError:
+                        response = ({"ok": False, "error": "unsupported_audio"}, b"")
+                    except Exception as e:
+                        self.stats["errors"] += 1
+                        response = ({"ok": False, "error": str(e)}, b"")
+                    finally:
+                        self.in_flight -= 1
+
+                writer.write(encode_frame(*response))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, socket_path: str = SOCKET_PATH):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)  # stale socket from a previous run
+        server = await asyncio.start_unix_server(self.handle_connection, path=socket_path)
+        print(f"🚀 Inference sidecar listening on {socket_path}")
+        await self.load_models()
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(InferenceServer().serve())
@@ -0,0 +1,151 @@
+import re
+import hashlib
+
+import pandas as pd
+
+from app.geo import parse_location
+from app.warmup import DEFAULT_EMBEDDING_MODEL
+
+# Canonical column names, keyed by their normalized spelling
+# ("context triggers", "context_triggers" and "Context-Triggers" all match)
+COLUMNS = {
+    "id": "id",
+    "title": "title",
+    "content": "content",
+    "alt names": "alt-names",
+    "category": "category",
+    "context triggers": "context triggers",
+    "sustainability nudge": "sustainability nudge",
+}
+
+DEFAULT_BATCH_SIZE = 128
+
+
+def normalize_header(header: str) -> str:
+    return re.sub(r"[\s_\-]+", " ", str(header).strip().lower())
+
+
+def read_csv(csv_file: str) -> pd.DataFrame:
+    """Load a temples CSV and rename its columns to the canonical spellings"""
+    df = pd.read_csv(csv_file, encoding="utf-8-sig")
+    df.columns = [COLUMNS.get(normalize_header(col), col.strip()) for col in df.columns]
+    return df
+
+
+def _text(row, column: str) -> str:
+    value = row.get(column, "")
+    return "" if pd.isna(value) else str(value)
+
+
+def build_record(row, index, city: str) -> tuple:
+    """Turn one CSV row of `city` into (doc_id, combined_document, metadata)"""
+    doc_id = _text(row, "id") or str(index)
+
+    # ✨ CRITICAL: Combine ALL searchable fields into one document
+    title = _text(row, "title")
+    content = _text(row, "content")
+    alt_names = _text(row, "alt-names")
+    context_triggers = _text(row, "context triggers")
+    sustainability_nudge = _text(row, "sustainability nudge")
+
+    combined_document = f"""
+Title: {title}
+Content: {content}
+Alternative Names: {alt_names}
+Context: {context_triggers}
+Sustainability: {sustainability_nudge}
+    """.strip()
+
+    # Keep metadata separate for structured access
+    metadata = {
+        "title": title,
+        "alt-names": alt_names,
+        "category": _text(row, "category"),
+        "context_triggers": context_triggers,
+        "sustainability_nudge": sustainability_nudge,
+        "doc_hash": document_hash(combined_document),
+        # Structured station + coordinates from the "GPS: near ..." hint, when it names a place in the city's gazetteer
+        **parse_location(context_triggers, city),
+    }
+    return doc_id, combined_document, metadata
+
+
+def document_hash(document: str) -> str:
+    return hashlib.sha256(document.encode("utf-8")).hexdigest()
+
+
+def _batches(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def ingest_csv(collection, csv_file: str, city: str, batch_size: int = DEFAULT_BATCH_SIZE, delete_missing: bool = True,
+               model_id: str = DEFAULT_EMBEDDING_MODEL) -> dict:
+    """
+    Sync a Chroma collection with a CSV, touching only what changed:
+    - new rows, rows whose document text changed and rows embedded by another
+      model than model_id (the collection's embedding function) are embedded and upserted
+    - rows where only metadata changed get a metadata update (no re-embedding)
+    - rows no longer in the CSV are deleted
+    `city` picks the gazetteer the rows' GPS hints are located with.
+    Returns counts for each case.
+    """
+    df = read_csv(csv_file)
+    records = [
+        (doc_id, document, {**metadata, "embedding_model": model_id})
+        for doc_id, document, metadata in (build_record(row, index, city) for index, row in df.iterrows())
+    ]
+
+    existing = collection.get(include=["documents", "metadatas"])
+    existing_by_id = {
+        doc_id: (metadata or {}, document)
+        for doc_id, document, metadata in zip(existing["ids"], existing["documents"], existing["metadatas"])
+    }
+
+    to_embed = []
+    to_update = []
+    for doc_id, document, metadata in records:
+        if doc_id not in existing_by_id:
+            to_embed.append((doc_id, document, metadata))
+            continue
+        old_metadata, old_document = existing_by_id[doc_id]
+        # Older collections don't store doc_hash, so fall back to hashing the stored text
+        old_hash = old_metadata.get("doc_hash") or document_hash(old_document or "")
+        # Vectors from another model aren't comparable with this model's query vectors
+        old_model = old_metadata.get("embedding_model", DEFAULT_EMBEDDING_MODEL)
+        if old_hash != metadata["doc_hash"] or old_model != model_id:
+            to_embed.append((doc_id, document, metadata))
+        elif any(old_metadata.get(key) != value for key, value in metadata.items()):
+            to_update.append((doc_id, metadata))
+
+    for batch in _batches(to_embed, batch_size):
+        collection.upsert(
+            ids=[doc_id for doc_id, _, _ in batch],
+            documents=[document for _, document, _ in batch],  # ← Searches ALL fields!
+            metadatas=[metadata for _, _, metadata in batch]
+        )
+
+    for batch in _batches(to_update, batch_size):
+        collection.update(
+            ids=[doc_id for doc_id, _ in batch],
+            metadatas=[metadata for _, metadata in batch]
+        )
+
+    deleted = []
+    if delete_missing:
+        csv_ids = {doc_id for doc_id, _, _ in records}
+        deleted = [doc_id for doc_id in existing_by_id if doc_id not in csv_ids]
+        for batch in _batches(deleted, batch_size):
+            collection.delete(ids=batch)
+
+    return {
+        "rows": len(records),
+        "embedded": len(to_embed),
+        "metadata_updated": len(to_update),
+        "deleted": len(deleted),
+        "unchanged": len(records) - len(to_embed) - len(to_update),
+    }
+
+
+def has_changes(stats: dict) -> bool:
+    return bool(stats["embedded"] or stats["metadata_updated"] or stats["deleted"])
@@ -2,227 +2,795 @@ from dotenv import load_dotenv
 load_dotenv()  # <-- loads your .env file immediately
 
 import os
+import json
 import uvicorn
 import logging
-from fastapi import FastAPI, Query, File, UploadFile
-from fastapi.responses import Response
+from fastapi import FastAPI, Query, File, UploadFile, Depends, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse, JSONResponse, FileResponse
 from pydantic import BaseModel
+from typing import Optional
 import chromadb
-import pandas as pd
-from openai import OpenAI
-from threading import Lock
-from faster_whisper import WhisperModel
-from elevenlabs import ElevenLabs
-import tempfile
+from chromadb.config import Settings
+from elevenlabs import AsyncElevenLabs
 import time
+import asyncio
+from contextlib import asynccontextmanager
 
 from app.prompts import JAPANAUT_PROMPT
+from app.context import build_context, fallback_answer
+from app.streaming import split_sentences
+from app.clients import clients
+from app.answer_cache import answer_cache, normalize_query
+from app.singleflight import retrieval_flight, llm_flight, tts_flight
+from app.tts_cache import tts_cache
+from app.answer_packs import pack_store
+from app.cities import CityRouter, DEFAULT_CITY, CHROMA_MEMORY_LIMIT_MB, CHROMA_DB_DIR
+from app.geo import (
+    NearbyPrefetcher, bounding_box, boost_results, merge_results, within_radius, cache_scope,
+    GEO_RADIUS_KM, GEO_CANDIDATES, GEO_PREFETCH
+)
+from app.warmup import warm_embedding_model, load_embedding_function, embedding_model_id
+from app.embeddings import CachedEmbeddingFunction
+from app import stt
+from app.stt_batcher import transcribe_upload, stt_batcher
+from app.metrics import (
+    MetricsMiddleware, StatsCounter, register, render_metrics, stage, record_tokens,
+    request_timings, request_id, ERRORS, FIRST_AUDIO
+)
+from app.inference_client import InferenceClient, SidecarEmbeddingFunction, INFERENCE_SOCKET
+from app.concurrency import run_stt, run_retrieval, llm_semaphore, tts_semaphore, stt_semaphore, QUERY_BATCH_CONCURRENCY
+from app.admission import (
+    AdmissionMiddleware, OverloadedError, DeadlineExceeded, with_timeout, first_within, time_left,
+    SpeechUnavailable, clear_deadline, degrade, request_deadline, request_degraded, overloaded_response_headers,
+    LLM_MIN_SECONDS, TTS_MIN_SECONDS
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # --- Global variables ---
-CSV_FILE = "./temples_kamakura_v1.csv"
-COLLECTION_NAME = "temples_kamakura"
-chroma_client = chromadb.PersistentClient(path="./chroma_db")
-collection = None
+# Loaded HNSW indexes are kept in a size-bounded LRU, so memory stays flat as cities are added
+chroma_client = chromadb.PersistentClient(
+    path=CHROMA_DB_DIR,
+    settings=Settings(chroma_segment_cache_policy="LRU", chroma_memory_limit_bytes=CHROMA_MEMORY_LIMIT_MB * 1024 * 1024)
+    if CHROMA_MEMORY_LIMIT_MB > 0 else Settings()
+)
 
-# Whisper model (lazy load)
-whisper_model = None
-whisper_lock = Lock()
+# Optional shared inference sidecar: when set, Whisper and the embedding model
+# live in one separate process instead of in every uvicorn worker
+inference_client = InferenceClient(INFERENCE_SOCKET) if INFERENCE_SOCKET else None
+
+# Explicit embedding function so queries can be embedded once and reused;
+# the wrapper caches and micro-batches query embeddings (see app/embeddings.py)
+if inference_client is not None:
+    # Same image and env as the sidecar, so the same model
+    EMBEDDING_FN = CachedEmbeddingFunction(SidecarEmbeddingFunction(inference_client, embedding_model_id()))
+else:
+    EMBEDDING_FN = CachedEmbeddingFunction(load_embedding_function())
+
+# Retrieval engine: "chroma" (HNSW) or "numpy" (exact in-memory index + lexical match)
+RETRIEVAL_ENGINE = os.getenv("RETRIEVAL_ENGINE", "chroma")
+
+# One collection per city (temples_<city>), loaded on first use; see app/cities.py
+# Cached answers were grounded in the old documents, so a sync (CITY_SYNC_ON_LOAD) that changes anything clears them
+city_router = CityRouter(chroma_client, EMBEDDING_FN, engine=RETRIEVAL_ENGINE, on_changed=lambda _: answer_cache.invalidate())
+
+# Chunks passed to the LLM - measure before changing: python -m bench.retrieval_quality
+RETRIEVAL_N_RESULTS = int(os.getenv("RETRIEVAL_N_RESULTS", "2"))
+
+# Largest batch accepted by POST /query/batch
+QUERY_BATCH_MAX_SIZE = int(os.getenv("QUERY_BATCH_MAX_SIZE", "64"))
 
 # Choose model via env var
 MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+TTS_MODEL_ID = "eleven_flash_v2_5"  # ✅ Fast turbo model
+ELEVENLABS_VOICE = os.getenv("ELEVENLABS_VOICE_ID")
 
-# ✅ Initialize FastAPI app
-app = FastAPI()
+# Readiness: flipped once warmup has loaded everything (see /ready)
+startup_state = {"ready": False, "error": None, "components": {}}
 
-# ✅ CRITICAL: Load Chroma collection at module level (before any requests)
-print("🚀 Starting Japanaut backend...")
-start_time = time.time()
+# --- Startup steps (run in parallel from the lifespan) ---
+def load_collection():
+    """Discover the cities and pre-load the default one; the others load on their first query"""
+    cities = city_router.discover()
+    print(f"🗺️ Cities found: {', '.join(cities)}")
+    city_router.load(DEFAULT_CITY)
+
+async def warm_up():
+    print("🚀 Starting Japanaut backend...")
+    start_time = time.time()
+
+    async def step(name, awaitable):
+        step_start = time.time()
+        await awaitable
+        startup_state["components"][name] = round(time.time() - step_start, 2)
+        print(f"✅ {name} ready in {startup_state['components'][name]}s")
 
-try:
-    print(f"🔄 Pre-loading Chroma collection '{COLLECTION_NAME}'...")
     try:
-        collection = chroma_client.get_collection(COLLECTION_NAME)
-        print(f"✅ Loaded existing Chroma collection '{COLLECTION_NAME}'")
-    except chromadb.errors.InvalidCollectionException:
-        # Collection doesn't exist, create it from CSV
-        print(f"📝 Creating new collection '{COLLECTION_NAME}' from CSV...")
-        df = pd.read_csv(CSV_FILE, encoding="utf-8-sig")
-        df.columns = df.columns.str.strip()
-        collection = chroma_client.create_collection(COLLECTION_NAME)
-        
-        for _, row in df.iterrows():
-            doc_id = str(row.get("id", _))
-            
-            # Get all fields
-            title = str(row.get("title", ""))
-            content = str(row.get("content", ""))
-            alt_names = str(row.get("alt-names", ""))
-            context_triggers = str(row.get("context triggers", ""))
-            sustainability_nudge = str(row.get("sustainability nudge", ""))
-            
-            # Create combined searchable document
-            combined_document = f"""
-Title: {title}
-Content: {content}
-Alternative Names: {alt_names}
-Context: {context_triggers}
-Sustainability: {sustainability_nudge}
-            """.strip()
-            
-            # Keep metadata separate
-            metadata = {
-                "title": title,
-                "alt-names": alt_names,
-                "category": str(row.get("category", "")),
-                "context_triggers": context_triggers,
-                "sustainability_nudge": sustainability_nudge
-            }
-            
-            collection.add(
-                ids=[doc_id],
-                documents=[combined_document],
-                metadatas=[metadata]
+        if inference_client is not None:
+            # Models live in the sidecar; the collection sync needs its embeddings
+            await step("inference_sidecar", inference_client.wait_until_ready())
+            await asyncio.gather(
+                step("collection", asyncio.to_thread(load_collection)),
+                step("api_clients", clients.start()),
             )
-        
-        print(f"✅ {CSV_FILE} loaded into Chroma ({len(df)} entries)")
-    
-    # ✅ CRITICAL: Trigger embedding model download NOW by doing a dummy query
-    print("🔄 Pre-warming embedding model...")
-    dummy_results = collection.query(query_texts=["test"], n_results=1)
-    print("✅ Embedding model warmed up")
-    
-    elapsed = time.time() - start_time
-    print(f"✅ Startup complete in {elapsed:.2f}s")
-    
-except Exception as e:
-    print(f"❌ Startup error: {str(e)}")
-    raise
+        else:
+            await asyncio.gather(
+                step("collection", asyncio.to_thread(load_collection)),
+                step("embedding_model", asyncio.to_thread(warm_embedding_model, EMBEDDING_FN)),
+                step("whisper", run_stt(stt.get_model)),
+                step("api_clients", clients.start()),
+            )
+        # Everything is loaded; one real query pulls the HNSW index into memory
+        await retrieve(await embed_query("test"), "test", await city_router.get(DEFAULT_CITY))
+
+        startup_state["ready"] = True
+        print(f"✅ Startup complete in {time.time() - start_time:.2f}s")
+    except Exception as e:
+        startup_state["error"] = str(e)
+        print(f"❌ Startup error: {str(e)}")
+
+# ✅ App lifespan: warmup runs in the background so liveness (/) answers right away,
+# while /ready stays 503 until models, collection and API clients are loaded
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warmup_task = asyncio.create_task(warm_up())
+    yield
+    warmup_task.cancel()
+    await clients.close()
+
+# ✅ Initialize FastAPI app
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(AdmissionMiddleware)
+app.add_middleware(MetricsMiddleware)  # outermost, so shed requests are counted too
+
+@app.exception_handler(OverloadedError)
+@app.exception_handler(DeadlineExceeded)
+async def shed_request(request: Request, exc: Exception):
+    """Saturated or out of time: fail fast with a retry hint instead of queueing"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"Japanaut is busy ({exc}), try again shortly"},
+        headers=overloaded_response_headers()
+    )
+
+# Cache and batching counters already live in their own stats dicts
+register(StatsCounter("japanaut_answer_cache_total", "Answer cache lookups by result", "result", lambda: answer_cache.stats))
+register(StatsCounter("japanaut_tts_cache_total", "TTS cache lookups by result", "result", lambda: tts_cache.stats))
+register(StatsCounter("japanaut_embedding_cache_total", "Query embeddings by cache result, and model calls", "result", lambda: EMBEDDING_FN.stats))
+register(StatsCounter("japanaut_stt_batches_total", "Micro-batched Whisper runs", "kind", lambda: stt_batcher.stats))
+register(StatsCounter("japanaut_geo_prefetch_total", "Nearby-site answer warming", "outcome", lambda: nearby_prefetcher.stats))
+register(StatsCounter("japanaut_city_router_total", "City lookups: already loaded, loaded on demand, unloaded", "event", lambda: city_router.stats))
+
+def require_ready():
+    """Dependency for endpoints that need the models and collection loaded"""
+    if not startup_state["ready"]:
+        raise HTTPException(status_code=503, detail="Japanaut is still warming up, try again shortly")
 
 # --- Response model for GPT-4 endpoint ---
 class LLMResponse(BaseModel):
     query: str
     response: str
 
-# --- Helper function to get GPT response ---
-def get_gpt_response(query_text: str) -> str:
-    """Shared function to get GPT response from query text"""
-    global collection
+class BatchQueryRequest(BaseModel):
+    queries: list[str]
+    stream: bool = False  # NDJSON, one line per query as it finishes
+    lat: Optional[float] = None  # optional user location, applied to every query
+    lon: Optional[float] = None
+    city: Optional[str] = None  # default: routed per query from the location or the question
+
+class BatchQueryItem(BaseModel):
+    index: int
+    query: str
+    response: Optional[str] = None
+    degraded: bool = False  # answered from the documents, without the LLM
+    error: Optional[str] = None
+
+class BatchQueryResponse(BaseModel):
+    results: list[BatchQueryItem]
+
+# --- Retrieval helpers ---
+async def embed_query(query_text: str) -> list:
+    """Embed the query once; the vector is reused for retrieval and the answer cache"""
+    return (await embed_queries([query_text]))[0]
+
+async def embed_queries(query_texts: list) -> list:
+    """Embed several queries in one model call (repeats come from the embedding cache)"""
+    with stage("embed"):
+        return await EMBEDDING_FN.embed_queries(list(query_texts))
+
+async def retrieve(query_embedding, query_text: str, city, location: tuple = None) -> dict:
+    return (await retrieve_many([query_embedding], [query_text], city, location))[0]
+
+async def retrieve_many(query_embeddings: list, query_texts: list, city, location: tuple = None) -> list:
+    """
+    One search call for all queries in one (loaded) city; returns a Chroma-shaped
+    result dict per query. With a (lat, lon) location, sites within GEO_RADIUS_KM
+    get a ranking boost; location never hides a site the question is about.
+    """
+    nearby = nearby_sites(location, city)
+    n_results = RETRIEVAL_N_RESULTS * GEO_CANDIDATES if nearby else RETRIEVAL_N_RESULTS
 
+    with stage("retrieval"):
+        per_query = await search_city(query_embeddings, query_texts, city, n_results)
+        # Many sites close by: the best of them may not make the overall top-k, so
+        # search them separately and let both sets compete in the boost
+        if len(nearby) >= RETRIEVAL_N_RESULTS:
+            local = await search_city(query_embeddings, query_texts, city, min(n_results, len(nearby)), nearby, location)
+            per_query = [merge_results(result, extra) for result, extra in zip(per_query, local)]
+
+    if nearby:
+        per_query = [boost_results(result, nearby, RETRIEVAL_N_RESULTS) for result in per_query]
+    return per_query
+
+async def search_city(query_embeddings: list, query_texts: list, city, n_results: int, nearby: dict = None, location: tuple = None) -> list:
+    """Result dict per query; with `nearby`, only those sites (the same radius rule in both engines)"""
+    # Exact in-memory search is a single matrix product - no thread hop needed
+    if city.vector_index is not None:
+        results = city.vector_index.query(
+            query_embeddings, query_texts=query_texts, n_results=n_results,
+            candidate_ids=set(nearby) if nearby is not None else None
+        )
+    else:
+        where = bounding_box(*location, GEO_RADIUS_KM) if nearby is not None else None
+        # HNSW search is blocking, so keep it off the event loop
+        results = await run_retrieval(
+            lambda: city.collection.query(query_embeddings=list(query_embeddings), n_results=n_results, where=where)
+        )
+
+    per_query_keys = [key for key in ("ids", "documents", "metadatas", "distances") if results.get(key) is not None]
+    per_query = [{key: [results[key][i]] for key in per_query_keys} for i in range(len(query_texts))]
+    if nearby is not None and city.vector_index is None:
+        # The box's corners reach past the radius
+        per_query = [within_radius(result, nearby) for result in per_query]
+    return per_query
+
+def nearby_sites(location: tuple, city) -> dict:
+    """{doc_id: km} within GEO_RADIUS_KM of the user; also starts warming caches for the closest"""
+    if location is None:
+        return {}
+    nearby = city.geo_index.nearby(*location, GEO_RADIUS_KM)
+    if nearby and GEO_PREFETCH:
+        nearby_prefetcher.schedule(city.geo_index, nearby, location)
+    return dict(nearby)
+
+async def warm_site(title: str, location: tuple):
+    """Background answer for the likely next question about a nearby site (routed to its city by location)"""
+    # Not part of the request that triggered it
+    request_timings.set(None)
+    request_deadline.set(None)
+    request_degraded.set(None)
     try:
-        # Check API key
-        OPENAI_KEY = os.getenv("OPENAI_API_KEY")
-        if not OPENAI_KEY:
-            raise ValueError("OPENAI_API_KEY environment variable is missing!")
-        client = OpenAI(api_key=OPENAI_KEY)
-
-        # Collection is already loaded at startup
-        if collection is None:
-            raise RuntimeError("Chroma collection not initialized")
-
-        # Retrieve top Chroma chunks (reduced from 3 to 2 for speed)
-        results = collection.query(query_texts=[query_text], n_results=2)
-        chunks = results.get('documents', [[]])[0]
-        metadatas = results.get('metadatas', [[]])[0]
-        
-        if not chunks:
-            chunks = ["Sorry, I don't have information on that topic yet."]
-            metadatas = [{}]
+        await get_gpt_response(f"Tell me about {title}.", location, fallback=False)
+    except Exception as e:
+        print(f"⚠️ Prefetch of '{title}' skipped: {str(e)}")
 
-        # Extract sustainability nudges from results
-        context_parts = []
-        sustainability_nudges = []
-        
-        for i, (chunk, metadata) in enumerate(zip(chunks, metadatas)):
-            # Add the main content
-            context_parts.append(f"Source {i+1}:\n{chunk}")
-            
-            # Extract sustainability nudge if present
-            nudge = metadata.get('sustainability_nudge', '').strip()
-            if nudge and nudge.lower() != 'nan':
-                sustainability_nudges.append(nudge)
-        
-        context_text = "\n\n".join(context_parts)
-        
-        # Add sustainability section if we found nudges
-        if sustainability_nudges:
-            sustainability_text = "\n".join([f"• {nudge}" for nudge in sustainability_nudges])
-            context_text += f"\n\n🌱 Sustainability Tips:\n{sustainability_text}"
-
-        # Shorter user message (prompts.py covers detailed instructions)
-        user_message = f"{context_text}\n\nUser question: {query_text}"
-
-        # Call OpenAI Chat API
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=[
-                {"role": "system", "content": JAPANAUT_PROMPT},
-                {"role": "user", "content": user_message}
-            ],
-            temperature=0.7,
-            max_tokens=200
+nearby_prefetcher = NearbyPrefetcher(warm_site, is_busy=llm_semaphore.locked)
+
+# --- Helper to build the chat messages from retrieval results ---
+def build_messages(query_text: str, results: dict) -> list:
+    """
+    Static system prompt first, then the budgeted context (best match first),
+    then the question.
+    """
+    context_text = build_context(
+        query_text,
+        results.get('documents', [[]])[0],
+        results.get('metadatas', [[]])[0]
+    )
+    user_message = f"{context_text}\n\nUser question: {query_text}"
+
+    return [
+        {"role": "system", "content": JAPANAUT_PROMPT},
+        {"role": "user", "content": user_message}
+    ]
+
+# --- Answer cache lookup, then retrieval + prompt on a miss ---
+def cache_text(query_text: str, city: str, location: tuple = None) -> str:
+    """Answer cache key text: answers are only reused in the same city, and the same area when located"""
+    text = f"{query_text} in {city}"
+    return text if location is None else f"{text} {cache_scope(*location)}"
+
+async def prepare_query(query_text: str, location: tuple = None, city: str = None) -> dict:
+    """
+    Returns {"cached_answer": ...} on a cache hit (no LLM call needed), otherwise
+    the chat messages plus what's needed to cache the answer afterwards.
+    """
+    city = city_router.route(query_text, location, city)
+
+    # Exact hit skips embedding, retrieval and the LLM
+    cached_answer = answer_cache.get(cache_text(query_text, city, location))
+    if cached_answer is not None:
+        return {"cached_answer": cached_answer, "city": city}
+
+    # Identical questions arriving together share one embedding + search
+    query_embedding, results = await with_timeout("retrieval", retrieval_flight.do(
+        (normalize_query(query_text), location, city),
+        lambda: embed_and_retrieve(query_text, city, location)
+    ))
+    return prepare_from_results(query_text, query_embedding, results, city, location)
+
+async def embed_and_retrieve(query_text: str, city: str, location: tuple = None) -> tuple:
+    query_embedding, loaded_city = await asyncio.gather(embed_query(query_text), city_router.get(city))
+    return query_embedding, await retrieve(query_embedding, query_text, loaded_city, location)
+
+async def prepare_queries(query_texts: list, location: tuple = None, city: str = None) -> list:
+    """prepare_query for a whole batch: one embedding call for all cache misses, one search call per city"""
+    prepared = [None] * len(query_texts)
+    cities = [city_router.route(query_text, location, city) for query_text in query_texts]
+    misses = []
+    for i, query_text in enumerate(query_texts):
+        cached_answer = answer_cache.get(cache_text(query_text, cities[i], location))
+        if cached_answer is not None:
+            prepared[i] = {"cached_answer": cached_answer, "city": cities[i]}
+        else:
+            misses.append(i)
+
+    if misses:
+        await with_timeout("retrieval", retrieve_misses(query_texts, misses, cities, prepared, location))
+    return prepared
+
+async def retrieve_misses(query_texts: list, misses: list, cities: list, prepared: list, location: tuple = None):
+    embeddings = dict(zip(misses, await embed_queries([query_texts[i] for i in misses])))
+    by_city = {}
+    for i in misses:
+        by_city.setdefault(cities[i], []).append(i)
+    for city_name, indexes in by_city.items():
+        all_results = await retrieve_many(
+            [embeddings[i] for i in indexes], [query_texts[i] for i in indexes],
+            await city_router.get(city_name), location
         )
+        for i, results in zip(indexes, all_results):
+            prepared[i] = prepare_from_results(query_texts[i], embeddings[i], results, city_name, location)
+
+def prepare_from_results(query_text: str, query_embedding, results: dict, city: str, location: tuple = None) -> dict:
+    doc_ids = results.get('ids', [[]])[0]
+    sources = [
+        {"id": doc_id, "title": metadata.get("title", ""), "category": metadata.get("category", "")}
+        for doc_id, metadata in zip(doc_ids, results.get('metadatas', [[]])[0])
+    ]
+    # Document ids are only unique within a city's collection
+    cache_doc_ids = [f"{city}/{doc_id}" for doc_id in doc_ids]
+
+    # Near-duplicate hit: similar question grounded in the same documents
+    cached_answer = answer_cache.get_similar(cache_text(query_text, city, location), query_embedding, cache_doc_ids)
+    if cached_answer is not None:
+        return {"cached_answer": cached_answer, "city": city, "sources": sources}
+
+    return {
+        "messages": build_messages(query_text, results),
+        "fallback": fallback_answer(results.get('documents', [[]])[0]),
+        "cache_text": cache_text(query_text, city, location),
+        "embedding": query_embedding,
+        "doc_ids": cache_doc_ids,
+        "city": city,
+        "sources": sources
+    }
+
+# --- Helper to run the chat completion for a prepared query ---
+def llm_flight_key(prepared: dict) -> tuple:
+    """Same normalized question over the same documents = same completion"""
+    return normalize_query(prepared["cache_text"]), tuple(prepared["doc_ids"])
+
+async def generate_answer(query_text: str, prepared: dict) -> str:
+    """Calls the LLM (raises on failure) and caches the answer; identical concurrent calls share one completion"""
+    return await llm_flight.do(llm_flight_key(prepared), lambda: complete_answer(prepared))
+
+async def complete_answer(prepared: dict) -> str:
+    client = clients.openai
+
+    # Call OpenAI Chat API
+    async with llm_semaphore:
+        with stage("llm"):
+            response = await client.chat.completions.create(
+                model=MODEL,
+                messages=prepared["messages"],
+                temperature=0.7,
+                max_tokens=200
+            )
+    record_tokens(response.usage)
+
+    answer = response.choices[0].message.content.strip()
+    answer_cache.put(prepared["cache_text"], answer, prepared["embedding"], prepared["doc_ids"])
+    return answer
+
+# --- Helper function to get GPT response ---
+async def get_gpt_response(query_text: str, location: tuple = None, city: str = None, fallback: bool = True) -> str:
+    """
+    Shared function to get GPT response from query text. Raises when there is
+    nothing to answer from (e.g. retrieval failed); see answer_prepared for the LLM fallback.
+    """
+    prepared = await prepare_query(query_text, location, city)
+    answer, _ = await answer_prepared(query_text, prepared, fallback)
+    return answer
+
+async def answer_prepared(query_text: str, prepared: dict, fallback: bool = True) -> tuple:
+    """
+    (answer, degraded). When the LLM is saturated, fails or there isn't enough
+    time left for it, the answer is taken from the top retrieved document
+    instead (degraded=True, never cached). fallback=False raises instead.
+    """
+    if "cached_answer" in prepared:
+        return prepared["cached_answer"], False
+    if fallback and time_left() < LLM_MIN_SECONDS:
+        degrade("llm")
+        return prepared["fallback"], True
+    try:
+        return await with_timeout("llm", generate_answer(query_text, prepared)), False
+    except Exception as e:
+        if not fallback:
+            raise
+        print(f"⚠️ LLM unavailable [{request_id.get()}], answering from the documents: {str(e)}")
+        degrade("llm")
+        return prepared["fallback"], True
+
+# --- Helper to stream the GPT response token by token ---
+async def stream_gpt_response(query_text: str, prepared: dict = None, location: tuple = None, city: str = None):
+    """Same as get_gpt_response, but yields text deltas as they arrive"""
+    if prepared is None:
+        prepared = await prepare_query(query_text, location, city)
+    if "cached_answer" in prepared:
+        yield prepared["cached_answer"]
+        return
+
+    if time_left() < LLM_MIN_SECONDS:
+        degrade("llm")
+        yield prepared["fallback"]
+        return
+
+    # Concurrent identical questions read the same token stream
+    deltas = llm_flight.stream(llm_flight_key(prepared), lambda: stream_completion(prepared))
+    started = False
+    try:
+        async for delta in first_within("llm", deltas):
+            started = True
+            yield delta
+    except Exception as e:
+        # Nothing sent yet: the answer can still come from the documents
+        if started:
+            raise
+        print(f"⚠️ LLM unavailable [{request_id.get()}], answering from the documents: {str(e)}")
+        degrade("llm")
+        yield prepared["fallback"]
+
+async def stream_completion(prepared: dict):
+    client = clients.openai
+    answer_parts = []
+
+    async with llm_semaphore:
+        with stage("llm"):
+            stream = await client.chat.completions.create(
+                model=MODEL,
+                messages=prepared["messages"],
+                temperature=0.7,
+                max_tokens=200,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
 
-        answer = response.choices[0].message.content.strip()
-        return answer
+        async for chunk in stream:
+            # With include_usage, the final chunk carries token counts and no choices
+            record_tokens(getattr(chunk, "usage", None))
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                answer_parts.append(delta)
+                yield delta
 
+    answer_cache.put(prepared["cache_text"], "".join(answer_parts).strip(), prepared["embedding"], prepared["doc_ids"])
+
+# --- Helper to transcribe uploaded audio bytes with Whisper ---
+async def transcribe_audio(content: bytes, profile: str = None) -> tuple:
+    """
+    Transcribe in this process (micro-batched on the STT pool), or on the shared
+    inference sidecar when INFERENCE_SOCKET is set. Returns (text, details).
+    """
+    if inference_client is not None:
+        return await inference_client.transcribe(content, profile)
+    return await transcribe_upload(content, profile)
+
+# --- Helper to synthesize speech with ElevenLabs ---
+async def synthesize_speech(elevenlabs_client: AsyncElevenLabs, voice_id: str, text: str, **kwargs):
+    """Yields MP3 chunks for text as ElevenLabs streams them back (or the cached clip)"""
+    cache_key = tts_cache.key(voice_id, TTS_MODEL_ID, text, **kwargs)
+    cached_audio = await tts_cache.get(cache_key)
+    if cached_audio is not None:
+        yield cached_audio
+        return
+
+    async for audio_chunk in synthesize_live(elevenlabs_client, voice_id, text, cache_key, **kwargs):
+        yield audio_chunk
+
+def synthesize_live(elevenlabs_client: AsyncElevenLabs, voice_id: str, text: str, cache_key: str, **kwargs):
+    """ElevenLabs audio for text; identical text in flight (e.g. the same cached answer for a whole group) is synthesized once"""
+    return tts_flight.stream(cache_key, lambda: synthesize_upstream(elevenlabs_client, voice_id, text, cache_key, **kwargs))
+
+async def synthesize_upstream(elevenlabs_client: AsyncElevenLabs, voice_id: str, text: str, cache_key: str, **kwargs):
+    audio_chunks = []
+    async with tts_semaphore:
+        with stage("tts"):
+            async for audio_chunk in elevenlabs_client.text_to_speech.convert(
+                voice_id=voice_id,
+                text=text,
+                model_id=TTS_MODEL_ID,
+                **kwargs
+            ):
+                audio_chunks.append(audio_chunk)
+                yield audio_chunk
+
+    # Only reached when the whole clip arrived, so partial audio is never cached
+    await tts_cache.put(cache_key, b"".join(audio_chunks))
+
+# --- Streaming voice pipeline: LLM sentences -> TTS -> client ---
+async def stream_voice_answer(transcribed_text: str, elevenlabs_client: AsyncElevenLabs, voice_id: str, location: tuple = None, city: str = None):
+    """
+    Yields MP3 audio chunks for the answer. Each sentence is sent to ElevenLabs
+    as soon as the LLM finishes it, so the first audio plays long before the
+    full answer is generated. The LLM keeps generating while earlier sentences
+    are being synthesized. If TTS fails before the first audio chunk, raises
+    SpeechUnavailable with the whole text answer; errors before then propagate.
+    """
+    start = time.time()
+    first_audio = None
+    previous_text = None
+    texts = []
+    sentences = asyncio.Queue()
+
+    async def produce_sentences():
+        try:
+            async for sentence in split_sentences(stream_gpt_response(transcribed_text, location=location, city=city)):
+                await sentences.put(sentence)
+        finally:
+            await sentences.put(None)
+
+    producer = asyncio.create_task(produce_sentences())
+
+    try:
+        while (sentence := await sentences.get()) is not None:
+            texts.append(sentence)
+            # previous_text keeps prosody continuous across sentences
+            continuity = {"previous_text": previous_text} if previous_text else {}
+            try:
+                async for audio_chunk in first_within("tts", synthesize_speech(elevenlabs_client, voice_id, sentence, **continuity)):
+                    if first_audio is None:
+                        first_audio = time.time() - start
+                        # The listener has audio; later sentences only need to beat the TTS timeout
+                        clear_deadline()
+                    yield audio_chunk
+            except Exception as e:
+                if first_audio is not None:
+                    raise
+                # Nothing sent yet: the endpoint can still answer with the text
+                print(f"⚠️ TTS unavailable [{request_id.get()}], answering with text only: {str(e)}")
+                degrade("tts")
+                while (sentence := await sentences.get()) is not None:
+                    texts.append(sentence)
+                await producer
+                raise SpeechUnavailable(" ".join(texts)) from None
+            previous_text = sentence
+        # Surface LLM errors from the producer
+        await producer
     except Exception as e:
-        return f"An error occurred: {str(e)}"
+        if first_audio is None:
+            raise
+        # Headers are already sent, so all we can do is log and end the stream
+        ERRORS.inc(stage="stream")
+        print(f"❌ Streaming error [{request_id.get()}]: {str(e)}")
+    finally:
+        producer.cancel()
+
+    if first_audio is not None:
+        FIRST_AUDIO.observe(first_audio)
 
 # --- Text query endpoint (existing) ---
-@app.get("/query", response_model=LLMResponse)
-def query_chroma_llm(q: str = Query(..., description="Query text")):
-    answer = get_gpt_response(q)
+def location_param(lat: Optional[float], lon: Optional[float]) -> Optional[tuple]:
+    if lat is None and lon is None:
+        return None
+    if lat is None or lon is None:
+        raise HTTPException(status_code=400, detail="lat and lon must be given together")
+    return (lat, lon)
+
+def city_param(city: Optional[str]) -> Optional[str]:
+    if city is None:
+        return None
+    name = city.strip().lower()
+    if name not in city_router.cities:
+        raise HTTPException(status_code=400, detail=f"Unknown city '{city}' (choose from {', '.join(sorted(city_router.cities))})")
+    return name
+
+LAT_QUERY = Query(None, description="User latitude: nearby sites are searched first and ranked higher")
+LON_QUERY = Query(None, description="User longitude")
+CITY_QUERY = Query(None, description="City to answer about (default: from the location, else the question)")
+
+@app.get("/query", response_model=LLMResponse, dependencies=[Depends(require_ready)])
+async def query_chroma_llm(
+    q: str = Query(..., description="Query text"),
+    lat: Optional[float] = LAT_QUERY,
+    lon: Optional[float] = LON_QUERY,
+    city: Optional[str] = CITY_QUERY
+):
+    location, city = location_param(lat, lon), city_param(city)
+    try:
+        answer = await get_gpt_response(q, location, city)
+    except (OverloadedError, DeadlineExceeded):
+        raise
+    except Exception as e:
+        return JSONResponse({"error": f"An error occurred: {str(e)}"}, status_code=500)
     return LLMResponse(query=q, response=answer)
 
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.get("/query/stream", dependencies=[Depends(require_ready)])
+async def query_stream(
+    q: str = Query(..., description="Query text"),
+    lat: Optional[float] = LAT_QUERY,
+    lon: Optional[float] = LON_QUERY,
+    city: Optional[str] = CITY_QUERY
+):
+    """
+    Server-Sent Events version of /query. Events, in order:
+    - metadata: the city, matched sources (id, title, category) and whether the answer was cached
+    - token: {"text": ...} for each LLM delta
+    - done (or error)
+    """
+    location = location_param(lat, lon)
+    city = city_param(city)
+    try:
+        prepared = await prepare_query(q, location, city)
+    except (OverloadedError, DeadlineExceeded):
+        raise
+    except Exception as e:
+        return JSONResponse({"error": f"An error occurred: {str(e)}"}, status_code=500)
+
+    async def events():
+        yield sse_event("metadata", {
+            "query": q,
+            "city": prepared["city"],
+            "cached": "cached_answer" in prepared,
+            "sources": prepared.get("sources", [])
+        })
+        try:
+            async for delta in stream_gpt_response(q, prepared):
+                yield sse_event("token", {"text": delta})
+            yield sse_event("done", {})
+        except Exception as e:
+            ERRORS.inc(stage="stream")
+            print(f"❌ Stream error [{request_id.get()}]: {str(e)}")
+            yield sse_event("error", {"message": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Stop proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/query/batch", response_model=BatchQueryResponse, dependencies=[Depends(require_ready)])
+async def query_batch(request: BatchQueryRequest):
+    """
+    Answers many questions at once: one embedding call and one retrieval call
+    for the whole batch, then the LLM calls run concurrently (QUERY_BATCH_CONCURRENCY).
+    With stream=true each result is sent as an NDJSON line as soon as it is ready.
+    """
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="queries must not be empty")
+    if len(request.queries) > QUERY_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=413, detail=f"At most {QUERY_BATCH_MAX_SIZE} queries per batch")
+
+    prepared = await prepare_queries(request.queries, location_param(request.lat, request.lon), city_param(request.city))
+    semaphore = asyncio.Semaphore(QUERY_BATCH_CONCURRENCY)
+
+    async def answer(index: int) -> BatchQueryItem:
+        query_text = request.queries[index]
+        try:
+            if "cached_answer" in prepared[index]:
+                response, degraded = prepared[index]["cached_answer"], False
+            else:
+                async with semaphore:
+                    response, degraded = await answer_prepared(query_text, prepared[index])
+            return BatchQueryItem(index=index, query=query_text, response=response, degraded=degraded)
+        except Exception as e:
+            return BatchQueryItem(index=index, query=query_text, error=str(e))
+
+    tasks = [asyncio.create_task(answer(i)) for i in range(len(request.queries))]
+
+    if not request.stream:
+        return BatchQueryResponse(results=await asyncio.gather(*tasks))
+
+    async def results_as_completed():
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield (await finished).model_dump_json() + "\n"
+        finally:
+            # Client went away: don't keep paying for answers nobody reads
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(results_as_completed(), media_type="application/x-ndjson")
+
+# --- Shared voice pipeline steps ---
+def voice_request_error(stt_profile: str):
+    """Returns (message, status) if the voice request can't be served, else None"""
+    if not os.getenv("ELEVENLABS_API_KEY") or not ELEVENLABS_VOICE:
+        return "ElevenLabs credentials not configured", 500
+    if stt_profile and stt_profile not in stt.PROFILES:
+        return f"Unknown stt_profile '{stt_profile}' (choose from {', '.join(stt.PROFILES)})", 400
+    return None
+
+async def read_and_transcribe(audio: UploadFile, stt_profile: str) -> tuple:
+    with stage("upload"):
+        content = await audio.read()
+    with stage("stt"):
+        async with stt_semaphore:
+            return await with_timeout("stt", transcribe_audio(content, stt_profile))
+
+async def answer_as_speech(transcribed_text: str, location: tuple = None, city: str = None) -> tuple:
+    """
+    Full LLM answer, then the full TTS clip. Returns (answer, audio_bytes);
+    audio_bytes is None when the answer can only be given as text.
+    """
+    gpt_response = await get_gpt_response(transcribed_text, location, city)
+    return gpt_response, await speech_if_possible(gpt_response)
+
+async def speech_if_possible(text: str):
+    """The cached clip, else live TTS if there's time and capacity for it, else None (text-only)"""
+    cache_key = tts_cache.key(ELEVENLABS_VOICE, TTS_MODEL_ID, text)
+    cached_audio = await tts_cache.get(cache_key)
+    if cached_audio is not None:
+        return cached_audio
+    if time_left() < TTS_MIN_SECONDS:
+        degrade("tts")
+        return None
+
+    async def collect():
+        return b"".join([
+            audio_chunk async for audio_chunk in
+            synthesize_live(clients.elevenlabs, ELEVENLABS_VOICE, text, cache_key)
+        ])
+
+    try:
+        return await with_timeout("tts", collect())
+    except Exception as e:
+        print(f"⚠️ TTS unavailable [{request_id.get()}], answering with text only: {str(e)}")
+        degrade("tts")
+        return None
+
+async def prepend(first_chunk: bytes, rest):
+    yield first_chunk
+    async for chunk in rest:
+        yield chunk
+
+def text_only_response(transcribed_text: str, gpt_response: str) -> JSONResponse:
+    """Degraded voice answer: the app shows the text when there's no audio (X-Degraded: tts)"""
+    return JSONResponse({"query": transcribed_text, "response": gpt_response, "degraded": "text-only"})
+
 # --- NEW: Voice query endpoint ---
-@app.post("/voice-query")
-async def voice_query(audio: UploadFile = File(...)):
+@app.post("/voice-query", dependencies=[Depends(require_ready)])
+async def voice_query(
+    audio: UploadFile = File(...),
+    stream: bool = Query(False, description="Stream audio sentence by sentence as it is generated"),
+    stt_profile: str = Query(None, description="Whisper decoding profile: fast, balanced or accurate (default: by clip length)"),
+    lat: Optional[float] = LAT_QUERY,
+    lon: Optional[float] = LON_QUERY,
+    city: Optional[str] = CITY_QUERY
+):
     """
     Accepts audio file, transcribes it, gets GPT response, 
-    converts to speech, and returns audio
+    converts to speech, and returns audio.
+    Per-stage timings are in the Server-Timing header and on /metrics.
     """
-    global whisper_model
-    
-    # ✅ ADD TIMING DEBUG
-    timings = {}
-    start_total = time.time()
-    
+    location = location_param(lat, lon)
+    city = city_param(city)
     try:
-        # Get API keys
-        ELEVENLABS_KEY = os.getenv("ELEVENLABS_API_KEY")
-        ELEVENLABS_VOICE = os.getenv("ELEVENLABS_VOICE_ID")
+        error = voice_request_error(stt_profile)
+        if error:
+            message, status_code = error
+            return Response(content=message, status_code=status_code)
         
-        if not ELEVENLABS_KEY or not ELEVENLABS_VOICE:
-            return Response(
-                content="ElevenLabs credentials not configured",
-                status_code=500
-            )
-        
-        # Initialize Whisper model (lazy load)
-        with whisper_lock:
-            if whisper_model is None:
-                whisper_model = WhisperModel("base", device="cpu", compute_type="int8")
-        
-        # Save uploaded audio to temp file
-        start = time.time()
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_audio:
-            content = await audio.read()
-            temp_audio.write(content)
-            temp_audio_path = temp_audio.name
-        timings['audio_upload'] = round(time.time() - start, 2)
-        
-        # Transcribe audio with Whisper
-        start = time.time()
-        segments, info = whisper_model.transcribe(temp_audio_path, beam_size=5)
-        transcribed_text = " ".join([segment.text for segment in segments])
-        timings['stt_whisper'] = round(time.time() - start, 2)
-        
-        # Clean up temp audio file
-        os.unlink(temp_audio_path)
+        transcribed_text, _ = await read_and_transcribe(audio, stt_profile)
         
         if not transcribed_text.strip():
             return Response(
@@ -230,29 +798,21 @@ async def voice_query(audio: UploadFile = File(...)):
                 status_code=400
             )
         
-        # Get GPT response
-        start = time.time()
-        gpt_response = get_gpt_response(transcribed_text)
-        timings['gpt_processing'] = round(time.time() - start, 2)
-        
-        # Convert response to speech with ElevenLabs
-        start = time.time()
-        elevenlabs_client = ElevenLabs(api_key=ELEVENLABS_KEY)
-        
-        audio_response = elevenlabs_client.text_to_speech.convert(
-            voice_id=ELEVENLABS_VOICE,
-            text=gpt_response,
-            model_id="eleven_flash_v2_5"  # ✅ Fast turbo model
-        )
-        
-        # Collect audio bytes
-        audio_bytes = b"".join(audio_response)
-        timings['tts_elevenlabs'] = round(time.time() - start, 2)
-        
-        timings['total_backend'] = round(time.time() - start_total, 2)
-        
-        # ✅ LOG TIMINGS TO RAILWAY
-        print(f"⏱️ TIMINGS: {timings}")
+        # Streaming mode: LLM sentences go to TTS as they arrive. The first chunk
+        # is awaited here, so a failure before any audio still gets a proper response.
+        if stream:
+            audio_stream = stream_voice_answer(transcribed_text, clients.elevenlabs, ELEVENLABS_VOICE, location, city)
+            try:
+                first_chunk = await audio_stream.__anext__()
+            except SpeechUnavailable as e:
+                return text_only_response(transcribed_text, e.answer)
+            except StopAsyncIteration:
+                first_chunk = b""
+            return StreamingResponse(prepend(first_chunk, audio_stream), media_type="audio/mpeg")
+        
+        gpt_response, audio_bytes = await answer_as_speech(transcribed_text, location, city)
+        if audio_bytes is None:
+            return text_only_response(transcribed_text, gpt_response)
         
         # Return audio file
         return Response(
@@ -263,91 +823,111 @@ async def voice_query(audio: UploadFile = File(...)):
             }
         )
         
+    except (OverloadedError, DeadlineExceeded) as e:
+        return Response(
+            content=f"Japanaut is busy ({str(e)}), please try again in a moment",
+            status_code=503,
+            headers=overloaded_response_headers()
+        )
+    except stt.UnsupportedAudioError as e:
+        return Response(content=str(e), status_code=400)
     except Exception as e:
-        print(f"❌ Error: {str(e)}")
+        print(f"❌ Error [{request_id.get()}]: {str(e)}")
         return Response(
             content=f"Error processing voice query: {str(e)}",
             status_code=500
         )
 
 # --- DEBUG: Voice query with timing data ---
-@app.post("/voice-query-debug")
-async def voice_query_debug(audio: UploadFile = File(...)):
+@app.post("/voice-query-debug", dependencies=[Depends(require_ready)])
+async def voice_query_debug(
+    audio: UploadFile = File(...),
+    stt_profile: str = Query(None, description="Whisper decoding profile: fast, balanced or accurate (default: by clip length)")
+):
     """
-    Same as voice-query but returns timing breakdown as JSON instead of audio
+    Same pipeline as voice-query but returns the timing breakdown as JSON instead of audio
     """
-    timings = {}
     start_total = time.time()
-    global whisper_model
     
     try:
-        # Get API keys
-        ELEVENLABS_KEY = os.getenv("ELEVENLABS_API_KEY")
-        ELEVENLABS_VOICE = os.getenv("ELEVENLABS_VOICE_ID")
-        
-        if not ELEVENLABS_KEY or not ELEVENLABS_VOICE:
-            return {"error": "ElevenLabs credentials not configured"}
-        
-        # Initialize Whisper model
-        with whisper_lock:
-            if whisper_model is None:
-                whisper_model = WhisperModel("base", device="cpu", compute_type="int8")
-        
-        # Save uploaded audio to temp file
-        start = time.time()
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_audio:
-            content = await audio.read()
-            temp_audio.write(content)
-            temp_audio_path = temp_audio.name
-        timings['audio_upload_seconds'] = round(time.time() - start, 2)
-        
-        # Transcribe audio with Whisper
-        start = time.time()
-        segments, info = whisper_model.transcribe(temp_audio_path, beam_size=5)
-        transcribed_text = " ".join([segment.text for segment in segments])
-        timings['whisper_seconds'] = round(time.time() - start, 2)
-        
-        # Clean up temp audio file
-        os.unlink(temp_audio_path)
+        error = voice_request_error(stt_profile)
+        if error:
+            return {"error": error[0]}
         
+        transcribed_text, stt_details = await read_and_transcribe(audio, stt_profile)
         if not transcribed_text.strip():
             return {"error": "No speech detected"}
         
-        timings['transcribed_text'] = transcribed_text
-        
-        # Get GPT response
-        start = time.time()
-        gpt_response = get_gpt_response(transcribed_text)
-        timings['gpt_seconds'] = round(time.time() - start, 2)
-        timings['gpt_response_length'] = len(gpt_response)
-        
-        # Convert response to speech with ElevenLabs
-        start = time.time()
-        elevenlabs_client = ElevenLabs(api_key=ELEVENLABS_KEY)
-        
-        audio_response = elevenlabs_client.text_to_speech.convert(
-            voice_id=ELEVENLABS_VOICE,
-            text=gpt_response,
-            model_id="eleven_flash_v2_5"  # ✅ Fast turbo model
-        )
-        
-        # Collect audio bytes (just to measure time)
-        audio_bytes = b"".join(audio_response)
-        timings['tts_seconds'] = round(time.time() - start, 2)
-        timings['audio_size_kb'] = round(len(audio_bytes) / 1024, 2)
-        
-        timings['total_seconds'] = round(time.time() - start_total, 2)
-        
-        return timings
+        gpt_response, audio_bytes = await answer_as_speech(transcribed_text)
+        
+        debug_info = {
+            f"{name}_seconds": round(seconds, 2)
+            for name, seconds in request_timings.get().items()
+        }
+        debug_info.update({
+            "request_id": request_id.get(),
+            "stt_profile": stt_details["profile"],
+            "audio_duration_seconds": stt_details["duration"],
+            "transcribed_text": transcribed_text,
+            "gpt_response_length": len(gpt_response),
+            "audio_size_kb": round(len(audio_bytes) / 1024, 2) if audio_bytes is not None else None,
+            "degraded": request_degraded.get() or [],
+            "total_seconds": round(time.time() - start_total, 2)
+        })
+        return debug_info
         
     except Exception as e:
         return {"error": str(e)}
 
-# --- Root route for Railway health checks ---
+# --- Offline answer packs (built by `python -m app.pack_builder`) ---
+@app.get("/packs")
+def list_packs():
+    """Latest answer pack per area, with its version and download URL"""
+    return {
+        slug: {
+            **{key: value for key, value in entry.items() if key != "history"},
+            "url": f"/packs/{slug}"
+        }
+        for slug, entry in pack_store.index().items()
+    }
+
+@app.get("/packs/{area}")
+def download_pack(area: str, request: Request, version: str = Query(None, description="A kept older version (default: latest)")):
+    """The area's pack as a zip: manifest.json plus one MP3 per answer. Supports If-None-Match."""
+    path, pack_version = pack_store.find(area, version)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"No answer pack for area '{area}'")
+
+    etag = f'"{pack_version}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return FileResponse(
+        path,
+        media_type="application/zip",
+        filename=os.path.basename(path),
+        headers={"ETag": etag}
+    )
+
+# --- Prometheus metrics ---
+@app.get("/metrics")
+def metrics():
+    return Response(content=render_metrics(), media_type="text/plain; version=0.0.4")
+
+# --- Root route: liveness (the process is up) ---
 @app.get("/")
 def root():
     return {"status": "ok"}
 
+# --- Readiness route for Railway health checks: 503 until warmup finishes ---
+@app.get("/ready")
+def ready():
+    if not startup_state["ready"]:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "error" if startup_state["error"] else "warming_up", **startup_state}
+        )
+    return {"status": "ready", **startup_state}
+
 # --- Ping route ---
 @app.get("/ping")
 def ping():
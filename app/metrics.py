@@ -0,0 +1,180 @@
+import time
+import uuid
+import contextvars
+from contextlib import contextmanager
+from threading import Lock
+
+# Latency buckets in seconds: covers cache hits (ms) up to slow LLM/TTS calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Per-request stage timings (stage -> seconds), read by the middleware for Server-Timing
+request_timings = contextvars.ContextVar("request_timings", default=None)
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}  # sorted label tuple -> value
+        self._lock = Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(dict(key))} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}  # sorted label tuple -> [bucket counts..., sum, count]
+        self._lock = Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self._series.items()):
+            labels = dict(key)
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': bound})} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {series[-1]}")
+        return lines
+
+
+class StatsCounter:
+    """Exposes an existing stats dict (e.g. a cache's hit/miss counts) as a labeled counter at scrape time"""
+
+    def __init__(self, name: str, help_text: str, label: str, get_stats):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.get_stats = get_stats
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.get_stats().items()):
+            lines.append(f"{self.name}{_format_labels({self.label: key})} {value}")
+        return lines
+
+
+# --- The metrics we export ---
+REQUEST_DURATION = Histogram("japanaut_request_duration_seconds", "HTTP request latency")
+STAGE_DURATION = Histogram("japanaut_stage_duration_seconds", "Latency of each pipeline stage")
+FIRST_AUDIO = Histogram("japanaut_time_to_first_audio_seconds", "Streaming voice: time until the first audio chunk")
+REQUESTS = Counter("japanaut_requests_total", "HTTP requests")
+ERRORS = Counter("japanaut_errors_total", "Errors by pipeline stage")
+TOKENS = Counter("japanaut_llm_tokens_total", "OpenAI tokens used")
+
+_metrics = [REQUEST_DURATION, STAGE_DURATION, FIRST_AUDIO, REQUESTS, ERRORS, TOKENS]
+
+
+def register(metric):
+    _metrics.append(metric)
+    return metric
+
+
+def render_metrics() -> str:
+    """Everything in Prometheus text exposition format"""
+    lines = []
+    for metric in _metrics:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def stage(name: str):
+    """Time a pipeline stage: feeds the stage histogram and this request's Server-Timing header"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        ERRORS.inc(stage=name)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_DURATION.observe(elapsed, stage=name)
+        timings = request_timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0) + elapsed
+
+
+def record_tokens(usage):
+    if usage is None:
+        return
+    TOKENS.inc(usage.prompt_tokens, kind="prompt")
+    TOKENS.inc(usage.completion_tokens, kind="completion")
+
+
+def server_timing_header(timings: dict) -> str:
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items())
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware: gives every request an ID (or reuses X-Request-ID), collects its
+    stage timings, and adds Server-Timing and X-Request-ID headers to the response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope.get("headers") or []).get(b"x-request-id")
+        current_id = incoming.decode("latin-1") if incoming else uuid.uuid4().hex
+        timings = {}
+        id_token = request_id.set(current_id)
+        timings_token = request_timings.set(timings)
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                timings["total"] = time.perf_counter() - start
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing_header(timings).encode("latin-1")))
+                headers.append((b"x-request-id", current_id.encode("latin-1")))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            # Label by route template, not raw path, to keep label cardinality bounded
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            REQUESTS.inc(path=path, status=status["code"])
+            REQUEST_DURATION.observe(time.perf_counter() - start, path=path)
+            request_timings.reset(timings_token)
+            request_id.reset(id_token)
@@ -0,0 +1,119 @@
+"""
+Builds the offline answer packs: for every site in a city's CSV, answers its
+context-trigger questions through the normal get_gpt_response path,
+synthesizes them with the configured ElevenLabs voice, and writes one
+versioned zip per area (served by GET /packs/{area}).
+
+    python -m app.pack_builder                       # all areas of the default city
+    python -m app.pack_builder --city nara           # another city
+    python -m app.pack_builder --area hase-station   # one area
+    python -m app.pack_builder --no-audio            # text only
+"""
+import os
+import time
+import asyncio
+import argparse
+
+from app import main
+from app.clients import clients
+from app.tts_cache import tts_cache
+from app.ingest import read_csv, build_record
+from app.answer_packs import pack_store, build_pack, trigger_questions, area_slug, DEFAULT_AREA
+
+PACK_BUILD_CONCURRENCY = int(os.getenv("PACK_BUILD_CONCURRENCY", "4"))
+
+
+def sites_by_area(csv_file: str, city: str, default_area: str = DEFAULT_AREA) -> dict:
+    """area name -> [(site id, title, questions)], using the station parsed from the GPS hint"""
+    areas = {}
+    for index, row in read_csv(csv_file).iterrows():
+        doc_id, _, metadata = build_record(row, index, city)
+        area = metadata.get("station") or default_area
+        questions = trigger_questions(metadata["title"], metadata["context_triggers"])
+        areas.setdefault(area, []).append((doc_id, metadata["title"].strip(), questions))
+    return areas
+
+
+async def answer_question(city: str, site_id: str, title: str, question: str, with_audio: bool, semaphore) -> tuple:
+    """Returns (entry, audio_key, audio_bytes); entry is None when the answer failed, audio_key is None when only TTS did"""
+    async with semaphore:
+        try:
+            # No fallback: a pack must only contain real answers
+            answer = await main.get_gpt_response(question, city=city, fallback=False)
+        except Exception as e:
+            print(f"⚠️ {title}: '{question}' failed - {str(e)}")
+            return None, None, None
+
+        audio_key = audio = None
+        if with_audio:
+            try:
+                audio = b"".join([
+                    chunk async for chunk in
+                    main.synthesize_speech(clients.elevenlabs, main.ELEVENLABS_VOICE, answer)
+                ])
+                audio_key = tts_cache.key(main.ELEVENLABS_VOICE, main.TTS_MODEL_ID, answer)
+            except Exception as e:
+                # Keep the text answer; the app shows it when the entry has no audio
+                print(f"⚠️ {title}: no audio for '{question}' - {str(e)}")
+                audio = None
+
+    entry = {"question": question, "site_id": site_id, "site_title": title, "answer": answer, "audio_key": audio_key}
+    return entry, audio_key, audio
+
+
+async def build_area(city: str, area: str, sites: list, with_audio: bool, semaphore) -> dict:
+    results = await asyncio.gather(*(
+        answer_question(city, site_id, title, question, with_audio, semaphore)
+        for site_id, title, questions in sites
+        for question in questions
+    ))
+    entries = [entry for entry, _, _ in results if entry is not None]
+    audio = {key: clip for _, key, clip in results if key and clip}
+    failed = len(results) - len(entries)
+
+    info = {
+        "city": city,
+        "model": main.MODEL,
+        "tts_model": main.TTS_MODEL_ID if with_audio else None,
+        "voice": main.ELEVENLABS_VOICE if with_audio else None,
+        "sites": [{"id": site_id, "title": title} for site_id, title, _ in sites],
+    }
+    version, data = build_pack(area, entries, audio, info)
+    saved = pack_store.save(area, version, data, len(entries))
+    print(f"📦 {area}: {len(entries)} answers ({failed} failed), {len(audio)} clips, "
+          f"{saved['bytes'] / 1024:.0f} KB -> {saved['file']}")
+    return saved
+
+
+async def build_packs(city: str, csv_file: str = None, only_areas: list = None, with_audio: bool = True):
+    if with_audio and not main.ELEVENLABS_VOICE:
+        raise SystemExit("ELEVENLABS_VOICE_ID is not set (use --no-audio for text-only packs)")
+
+    start = time.time()
+    await asyncio.to_thread(main.load_collection)
+    if city not in main.city_router.cities:
+        raise SystemExit(f"Unknown city '{city}' (found: {', '.join(sorted(main.city_router.cities))})")
+    csv_file = csv_file or main.city_router.csv_file(city)
+    if not csv_file:
+        raise SystemExit(f"No temples_{city}_v<N>.csv for '{city}' (pass --csv)")
+
+    await clients.start()
+    try:
+        semaphore = asyncio.Semaphore(PACK_BUILD_CONCURRENCY)
+        for area, sites in sites_by_area(csv_file, city, city.title()).items():
+            if only_areas and area_slug(area) not in only_areas:
+                continue
+            await build_area(city, area, sites, with_audio, semaphore)
+    finally:
+        await clients.close()
+    print(f"✅ Answer packs built in {time.time() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build offline answer packs")
+    parser.add_argument("--city", default=main.DEFAULT_CITY)
+    parser.add_argument("--csv", help="default: the city's newest temples_<city>_v<N>.csv")
+    parser.add_argument("--area", action="append", help="area slug to build (repeatable, default: all)")
+    parser.add_argument("--no-audio", action="store_true", help="skip TTS, text answers only")
+    args = parser.parse_args()
+    asyncio.run(build_packs(args.city, args.csv, args.area, with_audio=not args.no_audio))
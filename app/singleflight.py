@@ -0,0 +1,129 @@
+import asyncio
+
+from app.metrics import Counter, register
+
+COALESCED = register(Counter(
+    "japanaut_singleflight_total",
+    "Pipeline work by role: leaders did it, followers shared an identical in-flight call"
+))
+
+
+class _SharedStream:
+    """Runs one async generator and replays its items to every subscriber, late joiners included"""
+
+    def __init__(self, source, on_done):
+        self.items = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self._changed = asyncio.Condition()
+        self._on_done = on_done
+        self.task = asyncio.create_task(self._pump(source))
+
+    async def _pump(self, source):
+        try:
+            async for item in source:
+                async with self._changed:
+                    self.items.append(item)
+                    self._changed.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            self._on_done()
+            async with self._changed:
+                self.done = True
+                self._changed.notify_all()
+
+    async def subscribe(self):
+        position = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: position < len(self.items) or self.done)
+                new_items = self.items[position:]
+                finished = self.done
+            for item in new_items:
+                yield item
+            position += len(new_items)
+            if finished and position >= len(self.items):
+                if self.error is not None:
+                    raise self.error
+                return
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+def _forget(calls: dict, key, call):
+    # Only if it's still this call - a cancelled one may already have been replaced
+    if calls.get(key) is call:
+        del calls[key]
+
+
+class SingleFlight:
+    """
+    Deduplicates identical concurrent work for one pipeline stage. The first
+    caller for a key starts the work; callers arriving while it is in flight
+    wait on the same result instead of repeating it. Nothing is kept once the
+    work finishes, so there is no staleness - that's the caches' job.
+
+    The work runs in its own task, so a leader that disconnects doesn't
+    cancel it for the followers. Once every caller has gone (timed out or
+    disconnected), the work is cancelled, freeing its semaphore slot.
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self._calls = {}  # key -> _Call
+        self._streams = {}  # key -> _SharedStream
+
+    async def do(self, key, make_call):
+        """Await make_call() once per key across concurrent callers"""
+        call = self._calls.get(key)
+        if call is None:
+            COALESCED.inc(stage=self.stage, role="leader")
+            call = _Call(asyncio.create_task(make_call()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: _forget(self._calls, key, call))
+            # Nobody may be left to await a failure - don't let asyncio warn about it
+            call.task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        else:
+            COALESCED.inc(stage=self.stage, role="follower")
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                _forget(self._calls, key, call)
+                call.task.cancel()
+
+    async def stream(self, key, make_stream):
+        """Iterate make_stream() once per key; concurrent callers get the same items as they arrive"""
+        shared = self._streams.get(key)
+        if shared is None:
+            COALESCED.inc(stage=self.stage, role="leader")
+            shared = _SharedStream(make_stream(), on_done=lambda: _forget(self._streams, key, shared))
+            self._streams[key] = shared
+        else:
+            COALESCED.inc(stage=self.stage, role="follower")
+
+        shared.subscribers += 1
+        try:
+            async for item in shared.subscribe():
+                yield item
+        finally:
+            shared.subscribers -= 1
+            if shared.subscribers == 0 and not shared.done:
+                _forget(self._streams, key, shared)
+                shared.task.cancel()
+
+
+retrieval_flight = SingleFlight("retrieval")
+llm_flight = SingleFlight("llm")
+tts_flight = SingleFlight("tts")
@@ -0,0 +1,30 @@
+import re
+
+# Sentence boundary: end punctuation (English or Japanese) followed by whitespace.
+# Japanese full stops don't need trailing whitespace.
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+|(?<=[。！？])")
+
+# Don't send tiny fragments ("Yes!") to TTS on their own - merge them forward
+MIN_SENTENCE_CHARS = 20
+
+
+async def split_sentences(token_stream):
+    """
+    Group an async iterator of LLM text deltas into complete sentences.
+    Yields each sentence as soon as its boundary arrives, then any leftover text at the end.
+    """
+    buffer = ""
+    async for token in token_stream:
+        buffer += token
+        while True:
+            boundary = next(
+                (m for m in SENTENCE_END.finditer(buffer) if m.start() >= MIN_SENTENCE_CHARS),
+                None,
+            )
+            if boundary is None:
+                break
+            yield buffer[:boundary.start()].strip()
+            buffer = buffer[boundary.end():]
+
+    if buffer.strip():
+        yield buffer.strip()
@@ -0,0 +1,177 @@
+import io
+import os
+from bisect import bisect_right
+from threading import Lock
+
+import av
+import numpy as np
+from faster_whisper import BatchedInferencePipeline, decode_audio
+from faster_whisper.vad import get_speech_timestamps
+
+from app.warmup import load_whisper_model, WHISPER_MODEL_SIZE
+
+SAMPLE_RATE = 16000
+
+# Pin the language (e.g. "en") to skip Whisper's language-detection pass
+STT_LANGUAGE = os.getenv("STT_LANGUAGE") or None
+
+# Clips shorter than this use the "fast" profile when none is requested
+SHORT_CLIP_SECONDS = float(os.getenv("STT_SHORT_CLIP_SECONDS", "8"))
+
+# Early reject: clips this quiet (RMS / peak, float audio in [-1, 1]) or this short never reach the model
+SILENCE_RMS = float(os.getenv("STT_SILENCE_RMS", "0.002"))
+SILENCE_PEAK = float(os.getenv("STT_SILENCE_PEAK", "0.01"))
+MIN_CLIP_SECONDS = float(os.getenv("STT_MIN_CLIP_SECONDS", "0.3"))
+
+# --- Named decoding profiles ---
+PROFILES = {
+    # Short tourist questions: greedy decoding, no temperature fallback
+    "fast": {"model": WHISPER_MODEL_SIZE, "beam_size": 1, "temperature": 0.0, "vad_filter": True},
+    # Previous default behaviour: beam search on the base model
+    "balanced": {"model": WHISPER_MODEL_SIZE, "beam_size": 5, "vad_filter": True},
+    # Long or noisy clips: bigger model, beam search (not baked into the image - loads on first use)
+    "accurate": {"model": os.getenv("WHISPER_ACCURATE_MODEL", "small"), "beam_size": 5, "vad_filter": True},
+}
+
+# Batched inference handles clips up to one Whisper window; longer ones go through transcribe_bytes
+MAX_BATCH_CLIP_SECONDS = 30
+
+
+
+class UnsupportedAudioError(ValueError):
+    """The upload isn't audio we can decode (unknown format or corrupt data)"""
+
+    def __init__(self):
+        super().__init__("Unsupported or corrupt audio")
+
+
+# Loaded Whisper models (and their batched pipelines), by size
+_models = {}
+_pipelines = {}
+_models_lock = Lock()
+
+
+def get_model(size: str = WHISPER_MODEL_SIZE):
+    with _models_lock:
+        if size not in _models:
+            _models[size] = load_whisper_model(size)
+        return _models[size]
+
+
+def get_batched_pipeline(size: str = WHISPER_MODEL_SIZE) -> BatchedInferencePipeline:
+    model = get_model(size)
+    with _models_lock:
+        if size not in _pipelines:
+            _pipelines[size] = BatchedInferencePipeline(model=model)
+        return _pipelines[size]
+
+
+def decode_upload(content: bytes) -> np.ndarray:
+    """Decode any uploaded audio format straight from memory to 16 kHz mono float32"""
+    try:
+        return decode_audio(io.BytesIO(content), sampling_rate=SAMPLE_RATE)
+    except av.error.FFmpegError as e:
+        raise UnsupportedAudioError() from e
+
+
+def is_silent(audio: np.ndarray) -> bool:
+    if len(audio) < MIN_CLIP_SECONDS * SAMPLE_RATE:
+        return True
+    rms = float(np.sqrt(np.mean(np.square(audio))))
+    peak = float(np.max(np.abs(audio)))
+    return rms < SILENCE_RMS or peak < SILENCE_PEAK
+
+
+def choose_profile(duration: float, requested: str = None) -> str:
+    if requested:
+        return requested
+    return "fast" if duration <= SHORT_CLIP_SECONDS else "balanced"
+
+
+def prepare_audio(content: bytes, profile: str = None) -> tuple:
+    """
+    Decode an upload and pick its profile.
+    Returns (audio, details) where details has the chosen profile, clip duration and silence flag.
+    """
+    if profile and profile not in PROFILES:
+        raise ValueError(f"Unknown STT profile '{profile}' (choose from {', '.join(PROFILES)})")
+
+    audio = decode_upload(content)
+    duration = round(len(audio) / SAMPLE_RATE, 2)
+
+    if is_silent(audio):
+        return audio, {"profile": None, "duration": duration, "silent": True}
+    return audio, {"profile": choose_profile(duration, profile), "duration": duration, "silent": False}
+
+
+def transcribe_bytes(content: bytes, profile: str = None) -> tuple:
+    """
+    Blocking transcription of uploaded audio bytes.
+    Returns (text, details) - see prepare_audio.
+    Silent clips return empty text without loading or running the model.
+    """
+    audio, details = prepare_audio(content, profile)
+    if details["silent"]:
+        return "", details
+    return transcribe_array(audio, details["profile"]), details
+
+
+def transcribe_array(audio: np.ndarray, profile: str) -> str:
+    options = dict(PROFILES[profile])
+    model = get_model(options.pop("model"))
+
+    segments, info = model.transcribe(audio, language=STT_LANGUAGE, **options)
+    return " ".join(segment.text for segment in segments).strip()
+
+
+def speech_only(audio: np.ndarray) -> np.ndarray:
+    """What vad_filter does before decoding: keep the speech Silero VAD finds, drop the silence"""
+    spans = get_speech_timestamps(audio)
+    return np.concatenate([audio[span["start"]:span["end"]] for span in spans]) if spans else audio[:0]
+
+
+def transcribe_batch(audios: list, profile: str) -> list:
+    """
+    Blocking batched transcription of several clips (each up to 30s) in one forward pass.
+    The clips are laid end to end and handed to the batched pipeline as separate
+    clip_timestamps, so each one is decoded as its own batch item.
+    Returns one text per clip, in order.
+    """
+    options = dict(PROFILES[profile])
+    pipeline = get_batched_pipeline(options.pop("model"))
+    # The pipeline ignores vad_filter once clip boundaries are given, so trim each clip here
+    if options.pop("vad_filter", False):
+        audios = [speech_only(audio) for audio in audios]
+
+    # Clips VAD found no speech in never reach the model
+    spoken = [i for i, audio in enumerate(audios) if len(audio)]
+    texts = [""] * len(audios)
+    if spoken:
+        for i, text in zip(spoken, _transcribe_clips(pipeline, [audios[i] for i in spoken], options)):
+            texts[i] = text
+    return texts
+
+
+def _transcribe_clips(pipeline: BatchedInferencePipeline, audios: list, options: dict) -> list:
+    clip_starts = (np.cumsum([0] + [len(audio) for audio in audios[:-1]]) / SAMPLE_RATE).tolist()
+    clips = [
+        {"start": float(start), "end": float(start + len(audio) / SAMPLE_RATE)}
+        for start, audio in zip(clip_starts, audios)
+    ]
+
+    segments, info = pipeline.transcribe(
+        np.concatenate(audios),
+        language=STT_LANGUAGE,
+        multilingual=STT_LANGUAGE is None,  # detect language per clip, not per batch
+        clip_timestamps=clips,
+        batch_size=len(audios),
+        **options
+    )
+
+    # Each segment's seek is its clip's offset (in frames) - map it back to the clip
+    texts = [[] for _ in audios]
+    frames_per_second = pipeline.model.frames_per_second
+    for segment in segments:
+        clip_index = bisect_right(clip_starts, segment.seek / frames_per_second + 0.01) - 1
+        texts[clip_index].append(segment.text)
+    return [" ".join(parts).strip() for parts in texts]
@@ -0,0 +1,83 @@
+import os
+import asyncio
+
+from app import stt
+from app.concurrency import run_stt
+
+# --- Micro-batching settings (tune via env vars) ---
+STT_BATCHING = os.getenv("STT_BATCHING", "true").lower() == "true"
+STT_BATCH_SIZE = int(os.getenv("STT_BATCH_SIZE", "8"))
+STT_BATCH_MAX_WAIT_MS = float(os.getenv("STT_BATCH_MAX_WAIT_MS", "30"))
+
+
+class WhisperBatcher:
+    """
+    Collects clips that arrive within a short window and transcribes them together.
+    A batch is flushed when it reaches max_batch_size or when its oldest clip has
+    waited max_wait_ms, whichever comes first. Clips are grouped per decoding
+    profile, since a batch shares one set of decoding options.
+    """
+
+    def __init__(self, max_batch_size=STT_BATCH_SIZE, max_wait_ms=STT_BATCH_MAX_WAIT_MS):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._pending = {}  # profile -> [(audio, future)]
+        self._timers = {}  # profile -> TimerHandle for the max-wait flush
+        self.stats = {"batches": 0, "clips": 0}
+
+    async def transcribe(self, audio, profile: str) -> str:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(profile, [])
+        pending.append((audio, future))
+
+        if len(pending) >= self.max_batch_size:
+            self._flush(profile)
+        elif profile not in self._timers:
+            self._timers[profile] = loop.call_later(self.max_wait, self._flush, profile)
+
+        return await future
+
+    def _flush(self, profile: str):
+        timer = self._timers.pop(profile, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(profile, [])
+        if batch:
+            asyncio.ensure_future(self._run(batch, profile))
+
+    async def _run(self, batch: list, profile: str):
+        self.stats["batches"] += 1
+        self.stats["clips"] += len(batch)
+        try:
+            texts = await run_stt(stt.transcribe_batch, [audio for audio, _ in batch], profile)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), text in zip(batch, texts):
+            if not future.done():
+                future.set_result(text)
+
+
+stt_batcher = WhisperBatcher()
+
+
+async def transcribe_upload(content: bytes, profile: str = None) -> tuple:
+    """
+    Decode in memory and transcribe on the bounded STT pool so the event loop stays free
+    (decoding is CPU work too, so it counts against the same limit).
+    Concurrent clips are micro-batched into one Whisper pass when batching is enabled.
+    Returns (text, details) - see stt.prepare_audio.
+    """
+    if not STT_BATCHING:
+        return await run_stt(stt.transcribe_bytes, content, profile)
+
+    audio, details = await run_stt(stt.prepare_audio, content, profile)
+    if details["silent"]:
+        return "", details
+    if details["duration"] > stt.MAX_BATCH_CLIP_SECONDS:
+        return await run_stt(stt.transcribe_array, audio, details["profile"]), details
+    return await stt_batcher.transcribe(audio, details["profile"]), details
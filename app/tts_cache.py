@@ -0,0 +1,134 @@
+import os
+import asyncio
+import hashlib
+from collections import OrderedDict
+from threading import Lock
+
+# --- Cache settings (tune via env vars) ---
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "./tts_cache")
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_MB", "256")) * 1024 * 1024  # 0 disables the cache
+TTS_CACHE_HOT_ENTRIES = int(os.getenv("TTS_CACHE_HOT_ENTRIES", "64"))
+
+
+class TTSCache:
+    """
+    Content-addressed cache of synthesized audio.
+    Disk tier: one file per clip, LRU-evicted (by mtime) once over the size bound.
+    Hot tier: the most recently used clips kept in memory.
+    Bytes are stored exactly as ElevenLabs returned them, so hits are served as-is.
+    """
+
+    def __init__(self, cache_dir=TTS_CACHE_DIR, max_bytes=TTS_CACHE_MAX_BYTES, hot_entries=TTS_CACHE_HOT_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hot_entries = hot_entries
+        self._hot = OrderedDict()  # key -> bytes
+        self._sizes = None  # key -> size on disk, built lazily from the directory
+        self._total_bytes = 0
+        self._lock = Lock()
+        self.stats = {"hot_hits": 0, "disk_hits": 0, "misses": 0}
+
+    @staticmethod
+    def key(voice_id: str, model_id: str, text: str, **tts_options) -> str:
+        """Hash of everything that changes the audio (voice, model, text, extra TTS options)"""
+        material = "\0".join([voice_id, model_id, text] + [f"{k}={v}" for k, v in sorted(tts_options.items())])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.mp3")
+
+    def _load_index(self):
+        if self._sizes is not None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".mp3"):
+                continue
+            stat = os.stat(os.path.join(self.cache_dir, name))
+            entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        # Oldest first, so eviction pops from the front
+        self._sizes = OrderedDict((key, size) for _, key, size in sorted(entries))
+        self._total_bytes = sum(self._sizes.values())
+
+    def _remember_hot(self, key: str, audio: bytes):
+        self._hot[key] = audio
+        self._hot.move_to_end(key)
+        while len(self._hot) > self.hot_entries:
+            self._hot.popitem(last=False)
+
+    def get_blocking(self, key: str):
+        if self.max_bytes <= 0:
+            self.stats["misses"] += 1
+            return None
+        with self._lock:
+            audio = self._hot.get(key)
+            if audio is not None:
+                self._hot.move_to_end(key)
+                self.stats["hot_hits"] += 1
+                return audio
+
+            self._load_index()
+            if key not in self._sizes:
+                self.stats["misses"] += 1
+                return None
+
+            try:
+                with open(self._path(key), "rb") as f:
+                    audio = f.read()
+                os.utime(self._path(key))  # mark as recently used
+            except FileNotFoundError:
+                self._total_bytes -= self._sizes.pop(key)
+                self.stats["misses"] += 1
+                return None
+
+            self._sizes.move_to_end(key)
+            self._remember_hot(key, audio)
+            self.stats["disk_hits"] += 1
+            return audio
+
+    def put_blocking(self, key: str, audio: bytes):
+        if not audio or self.max_bytes <= 0:
+            return
+        with self._lock:
+            self._load_index()
+            path = self._path(key)
+            temp_path = f"{path}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(audio)
+            os.replace(temp_path, path)  # atomic, readers never see half a file
+
+            self._total_bytes += len(audio) - self._sizes.get(key, 0)
+            self._sizes[key] = len(audio)
+            self._sizes.move_to_end(key)
+            self._remember_hot(key, audio)
+
+            # Evict least recently used clips until we're back under the bound
+            while self._total_bytes > self.max_bytes and len(self._sizes) > 1:
+                old_key, old_size = self._sizes.popitem(last=False)
+                self._hot.pop(old_key, None)
+                try:
+                    os.remove(self._path(old_key))
+                except FileNotFoundError:
+                    pass
+                self._total_bytes -= old_size
+
+    async def get(self, key: str):
+        if self.max_bytes <= 0:
+            self.stats["misses"] += 1
+            return None
+        # Hot tier hit doesn't need a thread hop
+        with self._lock:
+            audio = self._hot.get(key)
+            if audio is not None:
+                self._hot.move_to_end(key)
+                self.stats["hot_hits"] += 1
+        if audio is not None:
+            return audio
+        return await asyncio.to_thread(self.get_blocking, key)
+
+    async def put(self, key: str, audio: bytes):
+        await asyncio.to_thread(self.put_blocking, key, audio)
+
+
+tts_cache = TTSCache()
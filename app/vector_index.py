@@ -0,0 +1,97 @@
+import os
+import re
+import unicodedata
+
+import numpy as np
+
+# Weight of the lexical (title / alt-names) score in the hybrid ranking
+LEXICAL_WEIGHT = float(os.getenv("LEXICAL_WEIGHT", "0.3"))
+
+
+def _fold(text: str) -> str:
+    """Lowercase, strip macrons/accents (Kōtoku-in -> kotokuin), drop punctuation and spaces"""
+    text = unicodedata.normalize("NFKD", str(text)).lower()
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return re.sub(r"[\W_]+", "", text)
+
+
+def _bigrams(text: str) -> set:
+    folded = _fold(text)
+    if len(folded) < 2:
+        return {folded} if folded else set()
+    return {folded[i:i + 2] for i in range(len(folded) - 1)}
+
+
+class VectorIndex:
+    """
+    Exact in-memory retrieval over the whole collection.
+    All embeddings live in one contiguous, L2-normalized float32 matrix, so top-k is a
+    single matrix product. A character-bigram match on title/alt-names is blended in,
+    which catches names like 鶴岡八幡宮 that the embedding model handles poorly.
+    """
+
+    def __init__(self, ids, embeddings, documents, metadatas, lexical_weight=LEXICAL_WEIGHT):
+        matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.matrix = matrix / norms
+        self.ids = list(ids)
+        self.documents = list(documents)
+        self.metadatas = list(metadatas)
+        self.lexical_weight = lexical_weight
+
+        # One bigram set per name, grouped by document
+        self.names = []
+        for metadata in self.metadatas:
+            names = [metadata.get("title", "")] + str(metadata.get("alt-names", "")).split(",")
+            self.names.append([grams for grams in (_bigrams(name) for name in names) if grams])
+
+    @classmethod
+    def from_collection(cls, collection, **kwargs):
+        data = collection.get(include=["embeddings", "documents", "metadatas"])
+        return cls(data["ids"], data["embeddings"], data["documents"], data["metadatas"], **kwargs)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def lexical_scores(self, query_text: str) -> np.ndarray:
+        """Per document: best fraction of a name's bigrams that appear in the query (0..1)"""
+        query_grams = _bigrams(query_text)
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        if not query_grams:
+            return scores
+        for i, names in enumerate(self.names):
+            scores[i] = max((len(grams & query_grams) / len(grams) for grams in names), default=0.0)
+        return scores
+
+    def query(self, query_embeddings, query_texts=None, n_results=2, candidate_ids=None) -> dict:
+        """
+        Same result shape as collection.query: ids/documents/metadatas/distances,
+        one inner list per query. Distances are 1 - hybrid score.
+        candidate_ids restricts the search to those documents (like a Chroma `where`).
+        """
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        scores = (queries / norms) @ self.matrix.T  # (num_queries, num_docs) cosine
+
+        if query_texts is not None and self.lexical_weight > 0:
+            lexical = np.stack([self.lexical_scores(text) for text in query_texts])
+            scores = (1 - self.lexical_weight) * scores + self.lexical_weight * lexical
+
+        k = min(n_results, len(self.ids))
+        if candidate_ids is not None:
+            excluded = np.array([doc_id not in candidate_ids for doc_id in self.ids])
+            scores[:, excluded] = -np.inf
+            k = min(k, len(self.ids) - int(excluded.sum()))
+
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for row in scores:
+            # Partial sort is enough: only the top k need ordering
+            top = np.argpartition(-row, k - 1)[:k] if 0 < k < len(row) else np.arange(k)
+            top = top[np.argsort(-row[top])]
+            results["ids"].append([self.ids[i] for i in top])
+            results["documents"].append([self.documents[i] for i in top])
+            results["metadatas"].append([self.metadatas[i] for i in top])
+            results["distances"].append([float(1 - row[i]) for i in top])
+        return results
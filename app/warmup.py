@@ -0,0 +1,107 @@
+"""
+Model loading shared by the app's startup warmup and the Docker build.
+
+At image build time, `python -m app.warmup` downloads the embedding model and the
+Whisper weights into the image, so a cold start never hits the network for them.
+With EMBEDDING_QUANTIZED=true it also bakes the int8 copy of the embedding model.
+"""
+import os
+import time
+import importlib.util
+from functools import cached_property
+
+from chromadb.utils.embedding_functions.onnx_mini_lm_l6_v2 import ONNXMiniLM_L6_V2
+from faster_whisper import WhisperModel
+
+WHISPER_MODEL_SIZE = os.getenv("WHISPER_MODEL", "base")
+
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))  # ONNX Runtime intra-op threads, 0 = its default (all cores)
+# int8 weights: smaller and faster on CPU. Documents and queries must use the same model:
+# the collection sync (python -m app.cities) re-embeds documents tagged with another model.
+# Check python -m bench.retrieval_quality after switching.
+EMBEDDING_QUANTIZED = os.getenv("EMBEDDING_QUANTIZED", "false").lower() == "true"
+
+QUANTIZED_MODEL_FILE = "model_int8.onnx"
+
+# Each document records the model that embedded it; untagged ones came from Chroma's default model.
+# Lives here, not in app.ingest: the image bakes models with only this file copied in.
+DEFAULT_EMBEDDING_MODEL = ONNXMiniLM_L6_V2.MODEL_NAME
+
+
+def embedding_model_id(quantized: bool = EMBEDDING_QUANTIZED) -> str:
+    """Stored with every document, so a sync re-embeds the collection when the model changes"""
+    return f"{DEFAULT_EMBEDDING_MODEL}-int8" if quantized else DEFAULT_EMBEDDING_MODEL
+
+
+class TunedONNXMiniLM(ONNXMiniLM_L6_V2):
+    """
+    Chroma's default model (all-MiniLM-L6-v2 on ONNX Runtime) with a configurable
+    thread count and an optional int8 dynamically-quantized copy of the weights,
+    written next to the original the first time the model is loaded.
+    """
+
+    def __init__(self, threads=EMBEDDING_THREADS, quantized=EMBEDDING_QUANTIZED, **kwargs):
+        super().__init__(**kwargs)
+        self.threads = threads
+        # Quantizing needs the optional `onnx` package; without it the full-precision model is used
+        self.quantized = quantized and (
+            os.path.exists(self.model_path(QUANTIZED_MODEL_FILE)) or importlib.util.find_spec("onnx") is not None
+        )
+        if quantized and not self.quantized:
+            print("⚠️ EMBEDDING_QUANTIZED needs the `onnx` package to build the int8 model - using the full-precision one")
+        self.model_id = embedding_model_id(self.quantized)
+
+    def model_path(self, filename: str = "model.onnx") -> str:
+        return os.path.join(self.DOWNLOAD_PATH, self.EXTRACTED_FOLDER_NAME, filename)
+
+    @cached_property
+    def model(self):
+        providers = self._preferred_providers or self.ort.get_available_providers()
+        so = self.ort.SessionOptions()
+        so.log_severity_level = 3
+        if self.threads > 0:
+            so.intra_op_num_threads = self.threads
+            so.inter_op_num_threads = 1
+
+        path = self.model_path()
+        if self.quantized:
+            path = self.model_path(QUANTIZED_MODEL_FILE)
+            if not os.path.exists(path):
+                quantize_model(self.model_path(), path)
+        return self.ort.InferenceSession(path, providers=providers, sess_options=so)
+
+
+def quantize_model(source: str, target: str):
+    """Dynamic int8 quantization: weights stored as int8, activations quantized on the fly"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    print(f"🔄 Quantizing {source} to int8...")
+    tmp_path = f"{target}.tmp"
+    quantize_dynamic(source, tmp_path, weight_type=QuantType.QInt8)
+    os.replace(tmp_path, target)
+
+
+def load_embedding_function() -> TunedONNXMiniLM:
+    return TunedONNXMiniLM()
+
+
+def load_whisper_model(size: str = WHISPER_MODEL_SIZE) -> WhisperModel:
+    return WhisperModel(size, device="cpu", compute_type="int8")
+
+
+def warm_embedding_model(embedding_fn):
+    """First call downloads (if needed) and loads the ONNX model"""
+    embedding_fn(["warmup"])
+
+
+def bake():
+    start = time.time()
+    print("🔄 Baking embedding model...")
+    warm_embedding_model(load_embedding_function())
+    print(f"🔄 Baking Whisper '{WHISPER_MODEL_SIZE}' weights...")
+    load_whisper_model()
+    print(f"✅ Models baked in {time.time() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    bake()
@@ -0,0 +1,86 @@
+"""
+Query embedding cost: full-precision vs int8 model, ONNX thread counts,
+one-at-a-time vs micro-batched misses, and embedding-cache hits.
+
+Run from the repo root:
+    python -m bench.embedding_speed
+    python -m bench.embedding_speed --threads 1 2 4
+"""
+import time
+import asyncio
+import argparse
+import importlib.util
+import statistics
+
+import numpy as np
+
+from app.embeddings import CachedEmbeddingFunction
+from app.warmup import TunedONNXMiniLM
+from bench.retrieval_engines import labeled_queries, percentile
+
+REPEATS = 3
+
+
+def time_calls(embed, batches) -> list:
+    """Milliseconds per call"""
+    latencies = []
+    for _ in range(REPEATS):
+        for batch in batches:
+            start = time.perf_counter()
+            embed(batch)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def report(name, latencies, per_call):
+    print(f"{name:<32} p50: {statistics.median(latencies):7.2f} ms   "
+          f"p95: {percentile(latencies, 95):7.2f} ms   ({per_call})")
+
+
+async def time_cached(model, texts) -> tuple:
+    """(ms per query on a cold cache with concurrent misses batched, ms per query on hits)"""
+    cached = CachedEmbeddingFunction(model)
+    start = time.perf_counter()
+    await asyncio.gather(*(cached.embed_queries([text]) for text in texts))
+    cold = (time.perf_counter() - start) * 1000 / len(texts)
+    start = time.perf_counter()
+    await asyncio.gather(*(cached.embed_queries([text]) for text in texts))
+    warm = (time.perf_counter() - start) * 1000 / len(texts)
+    return cold, warm
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query embedding latency")
+    parser.add_argument("--threads", type=int, nargs="+", default=[0], help="ONNX intra-op threads (0 = default)")
+    args = parser.parse_args()
+
+    texts = [text for text, _ in labeled_queries()]
+    variants = [(False, threads) for threads in args.threads]
+    if importlib.util.find_spec("onnx") is not None:
+        variants += [(True, threads) for threads in args.threads]
+    else:
+        print("⚠️ `onnx` is not installed - skipping the int8 model\n")
+
+    reference = None
+    for quantized, threads in variants:
+        model = TunedONNXMiniLM(threads=threads, quantized=quantized)
+        model(["warmup"])
+        name = f"{'int8' if quantized else 'fp32'} threads={threads or 'default'}"
+
+        report(f"{name} single", time_calls(model, [[text] for text in texts]), "1 query per call")
+        report(f"{name} batch of 32", time_calls(model, [texts[i:i + 32] for i in range(0, len(texts), 32)]), "32 queries per call")
+        cold, warm = asyncio.run(time_cached(model, texts))
+        print(f"{name + ' cached wrapper':<32} miss: {cold:.2f} ms/query (batched)   hit: {warm:.3f} ms/query")
+
+        # How far the int8 vectors drift from full precision
+        vectors = np.asarray(model(texts), dtype=np.float32)
+        if reference is None:
+            reference = vectors
+        elif reference.shape == vectors.shape:
+            similarity = np.sum(reference * vectors, axis=1)
+            print(f"{'':<32} cosine vs fp32: mean {similarity.mean():.4f}, min {similarity.min():.4f}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
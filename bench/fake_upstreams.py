@@ -0,0 +1,164 @@
+"""
+Stand-in OpenAI and ElevenLabs servers for offline load tests.
+
+Serves just the two endpoints the app calls, with configurable latency so
+runs are repeatable and cost nothing:
+
+    python -m bench.fake_upstreams --port 9100
+
+then point the app at it:
+
+    OPENAI_BASE_URL=http://127.0.0.1:9100/v1 ELEVENLABS_BASE_URL=http://127.0.0.1:9100 \\
+        OPENAI_API_KEY=fake ELEVENLABS_API_KEY=fake ELEVENLABS_VOICE_ID=fake uvicorn app.main:app
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import argparse
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# --- Simulated upstream behaviour (tune via env vars or CLI flags) ---
+FAKE_LLM_TTFT_MS = float(os.getenv("FAKE_LLM_TTFT_MS", "400"))  # time to first token
+FAKE_LLM_TOKENS_PER_SEC = float(os.getenv("FAKE_LLM_TOKENS_PER_SEC", "80"))
+FAKE_LLM_TOKENS = int(os.getenv("FAKE_LLM_TOKENS", "120"))  # answer length
+FAKE_TTS_TTFB_MS = float(os.getenv("FAKE_TTS_TTFB_MS", "250"))  # time to first audio byte
+FAKE_TTS_BYTES_PER_CHAR = int(os.getenv("FAKE_TTS_BYTES_PER_CHAR", "400"))
+FAKE_TTS_CHUNK_MS = float(os.getenv("FAKE_TTS_CHUNK_MS", "20"))
+
+TTS_CHUNK_BYTES = 4096
+
+ANSWER_WORDS = (
+    "Hase-dera is a Jodo temple in Kamakura famous for its eleven-headed Kannon statue. "
+    "Visit in June for the hydrangeas, bring comfortable shoes, and walk from Hase Station. "
+    "Carry a reusable bottle and take your rubbish home to keep the grounds clean! "
+).split()
+
+app = FastAPI()
+settings = {
+    "ttft": FAKE_LLM_TTFT_MS / 1000,
+    "tokens_per_sec": FAKE_LLM_TOKENS_PER_SEC,
+    "tokens": FAKE_LLM_TOKENS,
+    "tts_ttfb": FAKE_TTS_TTFB_MS / 1000,
+    "tts_bytes_per_char": FAKE_TTS_BYTES_PER_CHAR,
+    "tts_chunk_delay": FAKE_TTS_CHUNK_MS / 1000,
+}
+
+
+def answer_tokens() -> list:
+    return [
+        ("" if i == 0 else " ") + ANSWER_WORDS[i % len(ANSWER_WORDS)]
+        for i in range(settings["tokens"])
+    ]
+
+
+def usage(messages: list, completion_tokens: int) -> dict:
+    # Rough count is enough for the token metrics
+    prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in messages)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def completion_chunk(completion_id: str, model: str, delta: dict, finish_reason=None, usage=None) -> str:
+    chunk = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if usage is None else [],
+    }
+    if usage is not None:
+        chunk["usage"] = usage
+    return f"data: {json.dumps(chunk)}\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "gpt-4o-mini")
+    messages = body.get("messages", [])
+    tokens = answer_tokens()
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    token_delay = 1 / settings["tokens_per_sec"] if settings["tokens_per_sec"] > 0 else 0
+
+    if not body.get("stream"):
+        await asyncio.sleep(settings["ttft"] + token_delay * len(tokens))
+        return JSONResponse({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(tokens)},
+                "finish_reason": "stop",
+            }],
+            "usage": usage(messages, len(tokens)),
+        })
+
+    include_usage = (body.get("stream_options") or {}).get("include_usage")
+
+    async def events():
+        await asyncio.sleep(settings["ttft"])
+        yield completion_chunk(completion_id, model, {"role": "assistant", "content": ""})
+        for token in tokens:
+            yield completion_chunk(completion_id, model, {"content": token})
+            await asyncio.sleep(token_delay)
+        yield completion_chunk(completion_id, model, {}, finish_reason="stop")
+        if include_usage:
+            yield completion_chunk(completion_id, model, {}, usage=usage(messages, len(tokens)))
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/v1/text-to-speech/{voice_id}")
+async def text_to_speech(voice_id: str, request: Request):
+    body = await request.json()
+    size = max(TTS_CHUNK_BYTES, len(body.get("text", "")) * settings["tts_bytes_per_char"])
+
+    async def audio():
+        await asyncio.sleep(settings["tts_ttfb"])
+        sent = 0
+        while sent < size:
+            chunk = min(TTS_CHUNK_BYTES, size - sent)
+            yield b"\xff" * chunk
+            sent += chunk
+            await asyncio.sleep(settings["tts_chunk_delay"])
+
+    return StreamingResponse(audio(), media_type="audio/mpeg")
+
+
+@app.get("/")
+def health():
+    return {"status": "ok", **settings}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI + ElevenLabs upstreams")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--llm-ttft-ms", type=float, default=FAKE_LLM_TTFT_MS)
+    parser.add_argument("--llm-tokens-per-sec", type=float, default=FAKE_LLM_TOKENS_PER_SEC)
+    parser.add_argument("--llm-tokens", type=int, default=FAKE_LLM_TOKENS)
+    parser.add_argument("--tts-ttfb-ms", type=float, default=FAKE_TTS_TTFB_MS)
+    args = parser.parse_args()
+
+    settings.update(
+        ttft=args.llm_ttft_ms / 1000,
+        tokens_per_sec=args.llm_tokens_per_sec,
+        tokens=args.llm_tokens,
+        tts_ttfb=args.tts_ttfb_ms / 1000,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+Offline load test: runs the app against bench/fake_upstreams.py and replays
+the test_queries.py questions and Voice_test.wav at increasing concurrency.
+
+Reports throughput and p50/p95/p99 per endpoint, plus per-stage timings
+taken from the Server-Timing header, and saves the run as JSON so two runs
+can be compared.
+
+Run from the repo root:
+    python -m bench.load_test
+    python -m bench.load_test --levels 1,8,32 --requests 64 --compare bench/results/before.json
+
+Answer, TTS and query embedding caches are disabled by default so every request exercises the
+full pipeline (--with-caches keeps them on). Streaming responses send their
+headers early, so their Server-Timing only covers the stages that finished
+before the first byte.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+from datetime import datetime
+
+import httpx
+
+from test_queries import test_queries
+
+VOICE_FILE = "Voice_test.wav"
+RESULTS_DIR = os.path.join("bench", "results")
+
+ENDPOINTS = {
+    "query": {"method": "GET", "path": "/query"},
+    "voice": {"method": "POST", "path": "/voice-query"},
+    "voice-stream": {"method": "POST", "path": "/voice-query", "params": {"stream": "true"}},
+}
+
+
+def parse_server_timing(header: str) -> dict:
+    """'embed;dur=1.2, llm;dur=830.0' -> {'embed': 0.0012, 'llm': 0.83}"""
+    timings = {}
+    for part in header.split(","):
+        name, _, rest = part.strip().partition(";")
+        if name and rest.startswith("dur="):
+            timings[name] = float(rest[4:]) / 1000
+    return timings
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def summarize(values: list) -> dict:
+    if not values:
+        return {}
+    return {
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values),
+    }
+
+
+async def send_one(client: httpx.AsyncClient, endpoint: str, i: int, audio: bytes) -> dict:
+    spec = ENDPOINTS[endpoint]
+    params = dict(spec.get("params", {}))
+    files = None
+    if endpoint == "query":
+        params["q"] = test_queries[i % len(test_queries)]
+    else:
+        files = {"audio": (VOICE_FILE, audio, "audio/wav")}
+
+    start = time.perf_counter()
+    first_byte = None
+    try:
+        async with client.stream(spec["method"], spec["path"], params=params, files=files) as response:
+            async for _ in response.aiter_bytes():
+                if first_byte is None:
+                    first_byte = time.perf_counter() - start
+            status = response.status_code
+            stages = parse_server_timing(response.headers.get("server-timing", ""))
+    except httpx.HTTPError as e:
+        return {"ok": False, "status": type(e).__name__, "latency": time.perf_counter() - start}
+
+    return {
+        "ok": status == 200,
+        "status": status,
+        "latency": time.perf_counter() - start,
+        "first_byte": first_byte,
+        "stages": stages,
+    }
+
+
+async def run_level(client: httpx.AsyncClient, endpoint: str, concurrency: int, total: int, audio: bytes) -> dict:
+    """`concurrency` workers share `total` requests; returns the level's summary"""
+    jobs = iter(range(total))
+    results = []
+
+    async def worker():
+        for i in jobs:
+            results.append(await send_one(client, endpoint, i, audio))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    ok = [r for r in results if r["ok"]]
+    statuses = {}
+    for r in results:
+        statuses[str(r["status"])] = statuses.get(str(r["status"]), 0) + 1
+    stage_names = sorted({name for r in ok for name in r["stages"]})
+
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": total,
+        "ok": len(ok),
+        "statuses": statuses,
+        "throughput_rps": len(ok) / elapsed if elapsed else 0,
+        "latency": summarize([r["latency"] for r in ok]),
+        "first_byte": summarize([r["first_byte"] for r in ok if r["first_byte"] is not None]),
+        "stages": {
+            name: summarize([r["stages"][name] for r in ok if name in r["stages"]])
+            for name in stage_names
+        },
+    }
+
+
+def print_level(level: dict):
+    latency = level["latency"]
+    if not latency:
+        print(f"{level['endpoint']:<13} c={level['concurrency']:<4} no successful requests {level['statuses']}")
+        return
+    print(f"{level['endpoint']:<13} c={level['concurrency']:<4} "
+          f"{level['throughput_rps']:7.2f} req/s   "
+          f"p50 {latency['p50'] * 1000:8.1f} ms   p95 {latency['p95'] * 1000:8.1f} ms   "
+          f"p99 {latency['p99'] * 1000:8.1f} ms   ok {level['ok']}/{level['requests']}")
+    for name, stats in [("first byte", level["first_byte"]), *level["stages"].items()]:
+        if not stats:
+            continue
+        print(f"    {name:<12} p50 {stats['p50'] * 1000:8.1f} ms   p95 {stats['p95'] * 1000:8.1f} ms   "
+              f"p99 {stats['p99'] * 1000:8.1f} ms")
+
+
+def compare(current: dict, baseline: dict):
+    """Print p50/p95 and throughput change per endpoint and concurrency level"""
+    previous = {(level["endpoint"], level["concurrency"]): level for level in baseline["levels"]}
+    print(f"\n--- Compared with {baseline['started']} ---")
+    for level in current["levels"]:
+        before = previous.get((level["endpoint"], level["concurrency"]))
+        if not before or not before["latency"] or not level["latency"]:
+            continue
+        changes = []
+        for pct in ("p50", "p95"):
+            old, new = before["latency"][pct], level["latency"][pct]
+            changes.append(f"{pct} {old * 1000:.0f} -> {new * 1000:.0f} ms ({(new - old) / old * 100:+.1f}%)")
+        changes.append(f"{before['throughput_rps']:.2f} -> {level['throughput_rps']:.2f} req/s")
+        print(f"{level['endpoint']:<13} c={level['concurrency']:<4} " + "   ".join(changes))
+
+
+def start_process(module_args: list, env: dict) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-m", *module_args], env=env)
+
+
+async def wait_until_ready(url: str, timeout: float):
+    deadline = time.time() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            if time.time() > deadline:
+                raise TimeoutError(f"{url} not ready after {timeout}s")
+            await asyncio.sleep(0.5)
+
+
+async def run(args) -> dict:
+    with open(VOICE_FILE, "rb") as f:
+        audio = f.read()
+
+    run_info = {
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("compare", "output")},
+        "levels": [],
+    }
+    timeout = httpx.Timeout(args.request_timeout)
+    limits = httpx.Limits(max_connections=max(args.levels))
+    async with httpx.AsyncClient(base_url=args.app_url, timeout=timeout, limits=limits) as client:
+        for endpoint in args.endpoints:
+            for concurrency in args.levels:
+                level = await run_level(client, endpoint, concurrency, max(args.requests, concurrency), audio)
+                print_level(level)
+                run_info["levels"].append(level)
+    return run_info
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test against fake upstreams")
+    parser.add_argument("--levels", default="1,4,16", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=32, help="requests per endpoint and level")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help=f"any of {', '.join(ENDPOINTS)}")
+    parser.add_argument("--app-url", default=None, help="test an already running app instead of starting one")
+    parser.add_argument("--app-port", type=int, default=8100)
+    parser.add_argument("--fake-port", type=int, default=9100)
+    parser.add_argument("--llm-ttft-ms", type=float, default=400)
+    parser.add_argument("--llm-tokens-per-sec", type=float, default=80)
+    parser.add_argument("--llm-tokens", type=int, default=120)
+    parser.add_argument("--tts-ttfb-ms", type=float, default=250)
+    parser.add_argument("--with-caches", action="store_true", help="keep the answer, TTS and embedding caches on")
+    parser.add_argument("--ready-timeout", type=float, default=300)
+    parser.add_argument("--request-timeout", type=float, default=120)
+    parser.add_argument("--output", default=None, help="results file (default: bench/results/<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="earlier results file to diff against")
+    args = parser.parse_args()
+    args.levels = [int(level) for level in args.levels.split(",")]
+    args.endpoints = [endpoint for endpoint in args.endpoints.split(",") if endpoint]
+    unknown = set(args.endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+
+    processes = []
+    try:
+        if args.app_url is None:
+            fake_url = f"http://127.0.0.1:{args.fake_port}"
+            processes.append(start_process([
+                "bench.fake_upstreams", "--port", str(args.fake_port),
+                "--llm-ttft-ms", str(args.llm_ttft_ms),
+                "--llm-tokens-per-sec", str(args.llm_tokens_per_sec),
+                "--llm-tokens", str(args.llm_tokens),
+                "--tts-ttfb-ms", str(args.tts_ttfb_ms),
+            ], dict(os.environ)))
+
+            env = dict(
+                os.environ,
+                OPENAI_BASE_URL=f"{fake_url}/v1",
+                OPENAI_API_KEY="fake",
+                ELEVENLABS_BASE_URL=fake_url,
+                ELEVENLABS_API_KEY="fake",
+                ELEVENLABS_VOICE_ID="fake-voice",
+                HTTP2_ENABLED="false",  # the fake server speaks HTTP/1.1
+            )
+            if not args.with_caches:
+                env.update(ANSWER_CACHE_SIZE="0", TTS_CACHE_MAX_MB="0", EMBEDDING_CACHE_SIZE="0")
+            processes.append(start_process([
+                "uvicorn", "app.main:app", "--port", str(args.app_port), "--log-level", "warning",
+            ], env))
+            args.app_url = f"http://127.0.0.1:{args.app_port}"
+            asyncio.run(wait_until_ready(f"{fake_url}/", 30))
+
+        print(f"⏳ Waiting for {args.app_url}/ready ...")
+        asyncio.run(wait_until_ready(f"{args.app_url}/ready", args.ready_timeout))
+        run_info = asyncio.run(run(args))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{run_info['started'].replace(':', '-')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(run_info, f, indent=2)
+    print(f"\n💾 Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(run_info, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Chroma (HNSW) vs in-memory NumPy index: latency and recall on the temple corpus.
+
+Run from the repo root:
+    python -m bench.retrieval_engines
+"""
+import time
+import statistics
+
+import chromadb
+
+from app.ingest import read_csv, build_record
+from app.vector_index import VectorIndex
+from app.warmup import load_embedding_function
+
+CITY = "kamakura"
+CSV_FILE = f"temples_{CITY}_v1.csv"
+COLLECTION_NAME = "temples_kamakura"
+N_RESULTS = 2
+REPEATS = 20
+
+
+def labeled_queries():
+    """Every title and alt-name should retrieve its own row (ids and names as the app ingests them)"""
+    queries = []
+    for index, row in read_csv(CSV_FILE).iterrows():
+        doc_id, _, metadata = build_record(row, index, CITY)
+        names = [metadata["title"]] + metadata["alt-names"].split(",")
+        queries += [(name.strip(), doc_id) for name in names if name.strip()]
+    return queries
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(name, search, queries, embeddings):
+    hits = 0
+    latencies = []
+    for (text, expected_id), embedding in zip(queries, embeddings):
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            results = search(embedding, text)
+            latencies.append((time.perf_counter() - start) * 1000)
+        hits += expected_id in results["ids"][0]
+
+    print(f"{name:<8} recall@{N_RESULTS}: {hits / len(queries):.3f}   "
+          f"p50: {statistics.median(latencies):.3f} ms   p95: {percentile(latencies, 95):.3f} ms")
+
+
+def main():
+    embedding_fn = load_embedding_function()  # the serving model, so EMBEDDING_QUANTIZED is benchmarked too
+    client = chromadb.PersistentClient(path="./chroma_db")
+    collection = client.get_collection(COLLECTION_NAME, embedding_function=embedding_fn)
+    index = VectorIndex.from_collection(collection)
+    embedding_only = VectorIndex.from_collection(collection, lexical_weight=0)
+
+    queries = labeled_queries()
+    # Embed once up front: both engines get the same vectors, so we only time search
+    embeddings = embedding_fn([text for text, _ in queries])
+    print(f"📊 {len(queries)} labeled queries over {collection.count()} documents\n")
+
+    run("chroma", lambda emb, text: collection.query(query_embeddings=[emb], n_results=N_RESULTS), queries, embeddings)
+    run("numpy", lambda emb, text: embedding_only.query([emb], n_results=N_RESULTS), queries, embeddings)
+    run("hybrid", lambda emb, text: index.query([emb], query_texts=[text], n_results=N_RESULTS), queries, embeddings)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Retrieval quality and latency harness for the temple collection.
+
+Scores a labeled query set (English questions, titles, Japanese and English
+alt-names, context-trigger phrasing, sustainability nudges) with recall@k and
+MRR, times collection.query across n_results values and HNSW settings, and
+exits non-zero when overall quality is below the absolute floors, when quality
+or latency regresses past the saved baseline, or when there is no matching baseline.
+
+Run from the repo root:
+    python -m bench.retrieval_quality                    # compare with the baseline
+    python -m bench.retrieval_quality --update-baseline  # accept the current numbers
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import itertools
+import statistics
+
+import chromadb
+
+from app.ingest import read_csv, _text
+from app.warmup import load_embedding_function
+
+CSV_FILE = "temples_kamakura_v1.csv"
+COLLECTION_NAME = "temples_kamakura"
+BASELINE_FILE = os.path.join("bench", "retrieval_baseline.json")
+
+# What the app serves today (app/main.py reads the same env var)
+PRODUCTION_N_RESULTS = int(os.getenv("RETRIEVAL_N_RESULTS", "2"))
+N_RESULTS_GRID = (1, 2, 3, 5)
+HNSW_GRID = {
+    "hnsw:M": (8, 16, 32),
+    "hnsw:construction_ef": (100, 200),
+    "hnsw:search_ef": (10, 50, 100),
+}
+REPEATS = 10
+
+# Regression thresholds against the baseline
+MAX_RECALL_DROP = 0.02
+MAX_MRR_DROP = 0.02
+MAX_P95_INCREASE = 0.5  # relative: +50% - latency in CI is noisy
+
+# Absolute floors for the serving config (all queries), checked with or without a baseline
+MIN_RECALL = float(os.getenv("RETRIEVAL_MIN_RECALL", "0.7"))
+MIN_MRR = float(os.getenv("RETRIEVAL_MIN_MRR", "0.6"))
+
+# Hand-written queries: (query, kind, relevant ids). Nudge queries are
+# labeled by keyword instead, since several temples share the same advice.
+CURATED_QUERIES = [
+    ("Tell me about Tsurugaoka Hachimangu in Kamakura.", "english", {"1"}),
+    ("What is the best time of year to visit Hase-dera, and what should I bring?", "english", {"3"}),
+    ("Explain the history of Kencho-ji temple and its significance in Kamakura.", "english", {"5"}),
+    ("Are there any etiquette rules I should follow when visiting Japanese temples like Hase-dera?", "english", {"3"}),
+    ("Where is the big bronze Buddha statue?", "english", {"2"}),
+    ("Which temple is famous for hydrangeas?", "english", {"7"}),
+    ("Is there a temple with a bamboo forest and tea?", "english", {"8"}),
+    ("Where can I wash money for good luck?", "english", {"9"}),
+]
+NUDGE_QUERIES = [
+    ("walk instead of taxi", "taxi"),
+    ("cycle around Kamakura", "cycl"),
+    ("arrive early to avoid crowds", "early"),
+    ("keep quiet at the temple", "quiet"),
+    ("take the train, not a car", "train"),
+]
+
+QUOTED = re.compile(r"[“\"]([^”\"]+)[”\"]")
+CJK = re.compile(r"[぀-ヿ㐀-鿿]")
+
+
+def labeled_queries(csv_file: str = CSV_FILE) -> list:
+    """Build (query, kind, relevant ids) triples from the CSV plus the curated list"""
+    df = read_csv(csv_file)
+    rows = [(_text(row, "id"), row) for _, row in df.iterrows()]
+
+    queries = []
+    for doc_id, row in rows:
+        queries.append((_text(row, "title"), "title", {doc_id}))
+        for name in _text(row, "alt-names").split(","):
+            name = name.strip()
+            if name:
+                queries.append((name, "alt-name-ja" if CJK.search(name) else "alt-name-en", {doc_id}))
+
+    # Trigger phrases can repeat across rows ("samurai"), so any row listing it counts
+    triggers = {}
+    for doc_id, row in rows:
+        for phrase in QUOTED.findall(_text(row, "context triggers")):
+            triggers.setdefault(phrase.strip(), set()).add(doc_id)
+    queries += [(phrase, "trigger", ids) for phrase, ids in triggers.items() if phrase]
+
+    queries += CURATED_QUERIES
+    for query, keyword in NUDGE_QUERIES:
+        relevant = {doc_id for doc_id, row in rows if keyword in _text(row, "sustainability nudge").lower()}
+        if relevant:
+            queries.append((query, "nudge", relevant))
+    return queries
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def score(ranked_ids: list, relevant: set, k: int) -> tuple:
+    """(hit within top k, reciprocal rank of the first relevant id within top k)"""
+    for rank, doc_id in enumerate(ranked_ids[:k], start=1):
+        if doc_id in relevant:
+            return 1, 1 / rank
+    return 0, 0.0
+
+
+def evaluate(collection, queries: list, embeddings: list, n_results: int) -> dict:
+    """Recall@k and MRR per query kind, plus query latency, for one configuration"""
+    hits, reciprocal_ranks, latencies = {}, {}, []
+    for (_, kind, relevant), embedding in zip(queries, embeddings):
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            results = collection.query(query_embeddings=[embedding], n_results=n_results)
+            latencies.append((time.perf_counter() - start) * 1000)
+        hit, rr = score(results["ids"][0], relevant, n_results)
+        for key in (kind, "all"):
+            hits.setdefault(key, []).append(hit)
+            reciprocal_ranks.setdefault(key, []).append(rr)
+
+    return {
+        "recall": {kind: statistics.mean(values) for kind, values in hits.items()},
+        "mrr": {kind: statistics.mean(values) for kind, values in reciprocal_ranks.items()},
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": percentile(latencies, 95),
+    }
+
+
+def copy_collection(source, name: str, hnsw_params: dict):
+    """Load the stored vectors into a throwaway in-memory collection with other HNSW settings"""
+    data = source.get(include=["embeddings", "documents", "metadatas"])
+    client = chromadb.EphemeralClient()
+    target = client.create_collection(name, metadata={**(source.metadata or {}), **hnsw_params})
+    target.add(ids=data["ids"], embeddings=data["embeddings"], documents=data["documents"], metadatas=data["metadatas"])
+    return target, client
+
+
+def print_row(label: str, result: dict):
+    print(f"{label:<44} recall {result['recall']['all']:.3f}   MRR {result['mrr']['all']:.3f}   "
+          f"p50 {result['p50_ms']:.3f} ms   p95 {result['p95_ms']:.3f} ms")
+
+
+def check_floors(current: dict) -> list:
+    failures = []
+    if current["recall"]["all"] < MIN_RECALL:
+        failures.append(f"recall@{current['n_results']} {current['recall']['all']:.3f} is below the floor {MIN_RECALL:.3f}")
+    if current["mrr"]["all"] < MIN_MRR:
+        failures.append(f"MRR {current['mrr']['all']:.3f} is below the floor {MIN_MRR:.3f}")
+    return failures
+
+
+def fail(title: str, failures: list):
+    print(f"\n❌ {title}:")
+    for failure in failures:
+        print(f"  - {failure}")
+    sys.exit(1)
+
+
+def check_regressions(current: dict, baseline: dict) -> list:
+    failures = []
+    for kind, value in current["recall"].items():
+        old = baseline["recall"].get(kind)
+        if old is not None and value < old - MAX_RECALL_DROP:
+            failures.append(f"recall@{current['n_results']} ({kind}) {old:.3f} -> {value:.3f}")
+    for kind, value in current["mrr"].items():
+        old = baseline["mrr"].get(kind)
+        if old is not None and value < old - MAX_MRR_DROP:
+            failures.append(f"MRR ({kind}) {old:.3f} -> {value:.3f}")
+    if current["p95_ms"] > baseline["p95_ms"] * (1 + MAX_P95_INCREASE):
+        failures.append(f"p95 latency {baseline['p95_ms']:.3f} ms -> {current['p95_ms']:.3f} ms")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval quality and latency harness")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--update-baseline", action="store_true", help="save this run as the new baseline")
+    parser.add_argument("--skip-hnsw", action="store_true", help="skip the HNSW parameter sweep")
+    args = parser.parse_args()
+
+    # Same model settings as the app (EMBEDDING_QUANTIZED, EMBEDDING_THREADS)
+    embedding_fn = load_embedding_function()
+    client = chromadb.PersistentClient(path="./chroma_db")
+    collection = client.get_collection(COLLECTION_NAME, embedding_function=embedding_fn)
+
+    queries = labeled_queries()
+    embeddings = embedding_fn([query for query, _, _ in queries])
+    kinds = sorted({kind for _, kind, _ in queries})
+    print(f"📊 {len(queries)} labeled queries ({', '.join(kinds)}) over {collection.count()} documents\n")
+
+    print("--- n_results (production collection) ---")
+    by_n_results = {}
+    for n_results in N_RESULTS_GRID:
+        by_n_results[n_results] = evaluate(collection, queries, embeddings, n_results)
+        marker = "  <- serving" if n_results == PRODUCTION_N_RESULTS else ""
+        print_row(f"n_results={n_results}{marker}", by_n_results[n_results])
+
+    if not args.skip_hnsw:
+        print(f"\n--- HNSW parameters (n_results={PRODUCTION_N_RESULTS}) ---")
+        for values in itertools.product(*HNSW_GRID.values()):
+            params = dict(zip(HNSW_GRID, values))
+            copy, _client = copy_collection(collection, "hnsw_sweep", params)
+            label = " ".join(f"{key.split(':')[1]}={value}" for key, value in params.items())
+            print_row(label, evaluate(copy, queries, embeddings, PRODUCTION_N_RESULTS))
+            _client.delete_collection("hnsw_sweep")
+
+    current = {"n_results": PRODUCTION_N_RESULTS, "queries": len(queries), **by_n_results[PRODUCTION_N_RESULTS]}
+    print("\n--- Recall by query kind (serving config) ---")
+    for kind in kinds:
+        print(f"{kind:<14} recall@{PRODUCTION_N_RESULTS} {current['recall'][kind]:.3f}   MRR {current['mrr'][kind]:.3f}")
+
+    floor_failures = check_floors(current)
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"\n💾 Baseline saved to {args.baseline}")
+        if floor_failures:
+            fail("Retrieval is below the quality floors", floor_failures)
+        return
+
+    if floor_failures:
+        fail("Retrieval is below the quality floors", floor_failures)
+    if not os.path.exists(args.baseline):
+        fail("No baseline", [f"nothing at {args.baseline} - run with --update-baseline to record one"])
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("n_results") != PRODUCTION_N_RESULTS:
+        fail("Baseline doesn't match", [
+            f"recorded at n_results={baseline.get('n_results')}, serving {PRODUCTION_N_RESULTS} - "
+            f"re-run with --update-baseline after changing RETRIEVAL_N_RESULTS"
+        ])
+
+    failures = check_regressions(current, baseline)
+    if failures:
+        fail("Retrieval regressed", failures)
+    print("\n✅ Above the floors and no regression against the baseline")
+
+
+if __name__ == "__main__":
+    main()
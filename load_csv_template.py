@@ -1,64 +1,31 @@
-import pandas as pd
+import time
 import chromadb
 
+from app.cities import sync_all, CHROMA_DB_DIR, CITY_DATA_DIR, COLLECTION_PREFIX
+from app.warmup import load_embedding_function
+
 # -------------------------
 # 1️⃣ EDIT THESE VARIABLES
 # -------------------------
-CSV_FILE = "temples_kamakura_v1.csv"  # Updated filename
-COLLECTION_NAME = "temples_kamakura"   # Updated collection name
+DATA_DIR = CITY_DATA_DIR  # every temples_<city>_v<N>.csv here is synced into its temples_<city> collection
+REBUILD = []  # cities to drop and re-embed from scratch, e.g. ["kamakura"]
 # -------------------------
 
-# Load CSV safely
-df = pd.read_csv(CSV_FILE, encoding="utf-8-sig")
-df.columns = df.columns.str.strip()  # remove extra spaces from headers
-
 # Connect to persistent Chroma database
-client = chromadb.PersistentClient(path="./chroma_db")
-
-# Delete existing collection if you want to start fresh (optional)
-try:
-    client.delete_collection(COLLECTION_NAME)
-    print(f"🗑️ Deleted existing collection '{COLLECTION_NAME}'")
-except:
-    pass
-
-# Create the collection
-collection = client.create_collection(COLLECTION_NAME)
-
-# Add rows to collection
-for _, row in df.iterrows():
-    doc_id = str(row.get("id", _))
-    
-    # ✨ CRITICAL: Combine ALL searchable fields into one document
-    title = str(row.get("title", ""))
-    content = str(row.get("content", ""))
-    alt_names = str(row.get("alt-names", ""))
-    context_triggers = str(row.get("context triggers", ""))
-    sustainability_nudge = str(row.get("sustainability nudge", ""))
-    
-    # Create searchable document with all fields
-    combined_document = f"""
-Title: {title}
-Content: {content}
-Alternative Names: {alt_names}
-Context: {context_triggers}
-Sustainability: {sustainability_nudge}
-    """.strip()
-    
-    # Keep metadata separate for structured access
-    metadata = {
-        "title": title,
-        "alt-names": alt_names,
-        "category": str(row.get("category", "")),
-        "context_triggers": context_triggers,
-        "sustainability_nudge": sustainability_nudge
-    }
-
-    collection.add(
-        ids=[doc_id],
-        documents=[combined_document],  # ← Now searches ALL fields!
-        metadatas=[metadata]
-    )
-
-print(f"✅ {CSV_FILE} loaded into Chroma collection '{COLLECTION_NAME}'")
-print(f"📊 Total entries: {len(df)}")
\ No newline at end of file
+client = chromadb.PersistentClient(path=CHROMA_DB_DIR)
+
+for city in REBUILD:
+    try:
+        client.delete_collection(f"{COLLECTION_PREFIX}{city}")
+        print(f"🗑️ Deleted existing collection '{COLLECTION_PREFIX}{city}'")
+    except Exception:
+        pass
+
+# Same embedding function, model id and route metadata as the app and the image build
+# (python -m app.cities); only new/changed rows are embedded, rows missing from a CSV are removed
+start = time.time()
+cities = sync_all(client, load_embedding_function(), data_dir=DATA_DIR)
+
+print(f"✅ Cities synced in {time.time() - start:.2f}s: {', '.join(cities)}")
+for city in cities:
+    print(f"📊 {COLLECTION_PREFIX}{city}: {client.get_collection(f'{COLLECTION_PREFIX}{city}').count()} entries")
@@ -15,16 +15,17 @@ test_queries = [
     "Describe the architectural style of Hase-dera, its main statues, and any famous festivals held there."
 ]
 
-for q in test_queries:
-    encoded_query = urllib.parse.quote(q)
-    url = f"{BASE_URL}?q={encoded_query}"
+if __name__ == "__main__":
+    for q in test_queries:
+        encoded_query = urllib.parse.quote(q)
+        url = f"{BASE_URL}?q={encoded_query}"
     
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        print(f"--- QUERY ---\n{q}\n")
-        print(f"--- RESPONSE ---\n{data['response']}\n")
-        print("="*60 + "\n")
-    except Exception as e:
-        print(f"Error with query '{q}': {e}\n")
\ No newline at end of file
+        try:
+            response = requests.get(url)
+            response.raise_for_status()
+            data = response.json()
+            print(f"--- QUERY ---\n{q}\n")
+            print(f"--- RESPONSE ---\n{data['response']}\n")
+            print("="*60 + "\n")
+        except Exception as e:
+            print(f"Error with query '{q}': {e}\n")
\ No newline at end of file
@@ -1,7 +1,7 @@
 import requests
 
 url = "http://127.0.0.1:8000/voice-query"
-file_path = r"C:\Users\taylo\myapp-clean\Voice_test.wav"
+file_path = "Voice_test.wav"
 
 with open(file_path, "rb") as f:
     files = {"audio": (file_path, f, "audio/wav")}